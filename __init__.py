@@ -1,9 +1,35 @@
 # initialize src
+# Submodules are imported on first attribute access (PEP 562), so `import alplib` stays cheap
+# for short jobs that only need one or two of them.
+
+import importlib
+import importlib.util
 
 from .constants import *
-from .borrmann import Borrmann
-from .crystal import *
-from .decay import *
+
+
+# Public names re-exported at package level and the submodule defining them
+_lazy_attrs = {'Borrmann': 'borrmann', 'Crystal': 'crystal', 'get_crystal': 'crystal'}
+
+# Submodules whose public names used to be star-imported here
+_lazy_star = ('decay', 'crystal', 'borrmann')
+
+
+def __getattr__(name):
+    if name in _lazy_attrs:
+        return getattr(importlib.import_module('.' + _lazy_attrs[name], __name__), name)
+    if importlib.util.find_spec('.' + name, __name__) is not None:
+        return importlib.import_module('.' + name, __name__)
+    if not name.startswith('_'):
+        for module_name in _lazy_star:
+            module = importlib.import_module('.' + module_name, __name__)
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attrs))
 
 
 __all__ = ['Borrmann', 'Crystal', 'get_crystal']
@@ -45,7 +45,7 @@ def kaon_decay(p):
 
 
 def charged_meson_flux_mc(meson_type, p_min, p_max, theta_min, theta_max,
-                            n_samples=1000, p_proton=8.89, n_pot=18.75e20):
+                            n_samples=1000, p_proton=8.89, n_pot=18.75e20, rng=None):
     # Charged meson monte carlo flux simulation
     # Based on the Sanford-Wang and Feynman scaling parameterized proton prodution cross sections
     # momentum from [p_min, p_max] in GeV
@@ -59,8 +59,9 @@ def charged_meson_flux_mc(meson_type, p_min, p_max, theta_min, theta_max,
         meson_mass = M_K
         meson_lifetime = KAON_LIFETIME
     
-    p_list = np.random.uniform(p_min, p_max, n_samples)
-    theta_list = np.random.uniform(theta_min, theta_max, n_samples)
+    rng = get_rng(rng)
+    p_list = rng.uniform(p_min, p_max, n_samples)
+    theta_list = rng.uniform(theta_min, theta_max, n_samples)
 
     xs_wgt = meson_production_d2SdpdOmega(p_list, theta_list, p_proton, meson_type=meson_type) * sin(theta_list)
     probability_decay = p_decay(p_list*1e3, meson_mass, meson_lifetime, 50)
@@ -202,8 +203,9 @@ class ChargedPionFluxMiniBooNE:
 # Convolve flux with axion branching ratio and generate ALP flux
 class ChargedMeson3BodyDecay:
     def __init__(self, meson_flux, axion_mass=0.1, coupling=1.0, n_samples=50, meson_type="pion",
-                 m_lepton=M_MU, boson_type="P", energy_cut=140.0):
+                 m_lepton=M_MU, boson_type="P", energy_cut=140.0, seed=None):
         self.meson_flux = meson_flux
+        self.rng = get_rng(seed)
         if meson_type == "pion":
             self.mm = M_PI
             self.ckm = V_UD
@@ -307,9 +309,9 @@ class ChargedMeson3BodyDecay:
         ea_max = (self.mm**2 + self.ma**2 - self.m_lepton**2)/(2*self.mm)
 
         # Draw random variate energies and angles in the pion rest frame
-        energies = np.random.uniform(ea_min, ea_max, self.nsamples)
+        energies = self.rng.uniform(ea_min, ea_max, self.nsamples)
         momenta = sqrt(energies**2 - self.ma**2)
-        cosines = np.random.uniform(-1, 1, self.nsamples)
+        cosines = self.rng.uniform(-1, 1, self.nsamples)
         pz = momenta*cosines
 
         # Boost to lab frame
@@ -367,7 +369,7 @@ class ChargedMeson3BodyDecay:
             umax = exp(-2*self.dump_dist/decay_l) * power(exp(self.dump_dist/decay_l) - 1, 2) \
                 if decay_l > 1.0 else 1.0
             try:
-                u = np.random.uniform(0.0, min(umax, 1.0))
+                u = self.rng.uniform(0.0, min(umax, 1.0))
             except:
                 print("umax = ", umax, " decay l = ", decay_l, p[0])
             x = decay_quantile(u, p[0], self.mm, self.gamma_sm())
@@ -404,7 +406,7 @@ class ChargedMeson3BodyDecay:
         binned_events = np.zeros(cosine_bins.shape[0]-1)
         centers = (cosine_bins[1:] + cosine_bins[:-1])/2
         for i in range(self.scatter_weight.shape[0]):
-            rcos = np.random.uniform(-1, 1, self.nsamples)
+            rcos = self.rng.uniform(-1, 1, self.nsamples)
             xs = 4*pi*dark_iprim_dsigma_dcostheta(rcos, self.energies[i], gZN, gaGZ, self.ma, mZp)/self.nsamples
             wgts = eff(self.energies[i]) * 4.75 * self.scatter_weight[i]*n_e*power(METER_BY_MEV*100, 2)*xs  # ad hoc coherency factor 4.75
             h, hbins = np.histogram(rcos, weights=wgts, bins=cosine_bins)
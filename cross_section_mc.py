@@ -106,8 +106,9 @@ class LorentzVector:
 
 
 class Scatter2to2MC:
-    def __init__(self, mtrx2: MatrixElement2, p1: LorentzVector, p2: LorentzVector, n_samples=1000):
+    def __init__(self, mtrx2: MatrixElement2, p1: LorentzVector, p2: LorentzVector, n_samples=1000, seed=None):
         self.mtrx2 = mtrx2
+        self.rng = get_rng(seed)
 
         self.m1 = mtrx2.m1
         self.m2 = mtrx2.m2
@@ -148,8 +149,8 @@ class Scatter2to2MC:
         # Simulates events in CM frame
 
         # Draw random variates on the 2-sphere
-        phi_rnd = 2*pi*np.random.ranf(self.n_samples)
-        theta_rnd = arccos(1 - 2*np.random.ranf(self.n_samples))
+        phi_rnd = 2*pi*self.rng.random(self.n_samples)
+        theta_rnd = arccos(1 - 2*self.rng.random(self.n_samples))
 
         # Declare momenta and energy in the CM frame
         cm_p4 = self.lv_p1 + self.lv_p2
@@ -202,8 +203,9 @@ class Scatter2to2MC:
 
 
 class Decay2Body:
-    def __init__(self, mtrx2: MatrixElementDecay2, p: LorentzVector, n_samples=1000):
+    def __init__(self, mtrx2: MatrixElementDecay2, p: LorentzVector, n_samples=1000, seed=None):
         self.mtrx2 = mtrx2
+        self.rng = get_rng(seed)
         self.mp = mtrx2.m_parent  # parent particle
         self.m1 = mtrx2.m1  # decay body 1
         self.m2 = mtrx2.m2  # decay body 2
@@ -224,8 +226,8 @@ class Decay2Body:
         decay_width = (p_cm / (8*np.pi*self.mp**2)) * self.mtrx2()
 
         # Draw random variates on the 2-sphere
-        phi1_rnd = 2*pi*np.random.ranf(self.n_samples)
-        theta1_rnd = arccos(1 - 2*np.random.ranf(self.n_samples))
+        phi1_rnd = 2*pi*self.rng.random(self.n_samples)
+        theta1_rnd = arccos(1 - 2*self.rng.random(self.n_samples))
 
         v_in = self.lv_p.get_3velocity()
 
@@ -248,8 +250,8 @@ class Decay2Body:
         decay_width = (p_cm / (8*np.pi*self.mp**2)) * self.mtrx2()
 
         # Draw random variates on the 2-sphere
-        phi1_rnd = 2*pi*np.random.ranf(self.n_samples)
-        theta1_rnd = arccos(1 - 2*np.random.ranf(self.n_samples))
+        phi1_rnd = 2*pi*self.rng.random(self.n_samples)
+        theta1_rnd = arccos(1 - 2*self.rng.random(self.n_samples))
         phi2_rnd = np.pi + phi1_rnd
         theta2_rnd = np.pi - theta1_rnd
 
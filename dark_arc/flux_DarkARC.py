@@ -5,36 +5,29 @@ from numpy import sqrt, exp, log10, log, pi, interp
 from scipy.interpolate import interp2d
 from scipy.integrate import dblquad
 
+try:
+    from ..resources import load_table
+    from ..fmath import sample_unit_cube
+except ImportError:
+    # Imported as a top-level module (e.g. by plot_da_xs.py): read the text tables directly
+    # and take fmath (which has no package-relative imports) from the package directory
+    import os
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from fmath import sample_unit_cube
+
+    def load_table(relative_path, **options):
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return np.genfromtxt(os.path.join(package_dir, relative_path), **options)
+
 
 # Flux is arranged in TSV format, (T, q) = (row, col)
 
 
 class XeResponse:
     def __init__(self, shell, keV=1.0):
-        if shell=="5p":
-            self.data = np.genfromtxt("data/Xe_5p.txt")
-        if shell=="5s":
-            self.data = np.genfromtxt("data/Xe_5p.txt")
-        if shell=="4d":
-            self.data = np.genfromtxt("data/Xe_4d.txt")
-        if shell=="4p":
-            self.data = np.genfromtxt("data/Xe_4p.txt")
-        if shell=="4s":
-            self.data = np.genfromtxt("data/Xe_4s.txt")
-        if shell=="3d":
-            self.data = np.genfromtxt("data/Xe_3d.txt")
-        if shell=="3p":
-            self.data = np.genfromtxt("data/Xe_3p.txt")
-        if shell=="3s":
-            self.data = np.genfromtxt("data/Xe_3s.txt")
-        if shell=="2p":
-            self.data = np.genfromtxt("data/Xe_2p.txt")
-        if shell=="2s":
-            self.data = np.genfromtxt("data/Xe_2s.txt")
-        if shell=="1s":
-            self.data = np.genfromtxt("data/Xe_1s.txt")
-        if shell=="total":
-            self.data = np.genfromtxt("data/Xe_total.txt")
+        self.data = load_table("dark_arc/data/Xe_" + shell + ".txt")
         
         self.keV = keV
         self.me = 511*self.keV
@@ -62,15 +55,18 @@ class XeResponse:
             return (q / self.qMin)**2 * f(self.qMin, k)
         return f(q, k)
     
-    def DblIntegrate(self, wgtfunc, q_low, q_high, T_low, T_high, nsamples=1000):
+    def DblIntegrate(self, wgtfunc, q_low, q_high, T_low, T_high, nsamples=1000, method="mc", seed=None):
         # We use logarithmic MC integration here
+        # method: "mc", or "sobol" / "halton" for scrambled quasi-random points in (log q, log T);
+        # each call with a different seed is an independent randomized estimate
         def f(T, q):
             return T * q * self.W1(T, q) * wgtfunc(T, q) 
 
         integrand = np.vectorize(f)
 
-        dq_grid = 10**np.random.uniform(log10(q_low), log10(q_high), nsamples)
-        dT_grid = 10**np.random.uniform(log10(T_low), log10(T_high), nsamples)
+        u = sample_unit_cube(nsamples, 2, method=method, rng=seed)
+        dq_grid = 10**(log10(q_low) + (log10(q_high) - log10(q_low))*u[:,0])
+        dT_grid = 10**(log10(T_low) + (log10(T_high) - log10(T_low))*u[:,1])
 
         volume = (log10(q_high) - log10(q_low))*(log10(T_high) - log10(T_low)) * log(10)**2
 
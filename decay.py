@@ -16,8 +16,7 @@ def W_gg(g_agamma, ma):
 
 def W_ee(g_ae, ma):
     # a -> e+ e-
-    return g_ae**2 * ma * sqrt(1 - (2 * M_E / ma)**2) / (8 * pi) \
-        if 1 - 4 * (M_E / ma) ** 2 > 0 else 0.0
+    return g_ae**2 * ma * sqrt(np.maximum(1 - (2 * M_E / ma)**2, 0.0)) / (8 * pi)
 
 
 
@@ -95,6 +94,65 @@ def p_decay_in_region(p, m, tau, l, dl):
 
 
 
+def decay_in_region_probs(energy, m, width, l, dl, taylor_cutoff=1e-8):
+    # Vectorized survival probability up to l and decay probability within (l, l + dl)
+    # energy: lab frame energy, any shape
+    # mass of decaying particle m, decay width width in MeV (broadcastable against energy)
+    # l and dl in meters
+    # Returns (surv_prob, decay_prob) with the broadcast shape; both are zero below threshold.
+    # The decay probability uses the Taylor form dl/(v gamma c tau) where that exponent is tiny
+    # and -expm1 elsewhere, so it is accurate in both the long- and short-lifetime limits.
+    energy, m, width = np.broadcast_arrays(np.asarray(energy, dtype=np.float64),
+                                           np.asarray(m, dtype=np.float64),
+                                           np.asarray(width, dtype=np.float64))
+    above = energy > m
+    p = sqrt(np.where(above, (energy - m) * (energy + m), 1.0))
+
+    # l / (v gamma c tau) = l * width * m / p
+    x_dist = np.where(above, l * width * m / (METER_BY_MEV * p), 0.0)
+    x_len = np.where(above, dl * width * m / (METER_BY_MEV * p), 0.0)
+
+    surv_prob = np.where(above, exp(-x_dist), 0.0)
+    decay_prob = np.where(x_len < taylor_cutoff, x_len, -np.expm1(-x_len))
+    return surv_prob, decay_prob
+
+
+
+
+def decay_in_region_log_probs(energy, m, width, l, dl):
+    # log(surv_prob) and log(decay_prob) of decay_in_region_probs, for weights whose probabilities underflow
+    # separately in float64 but not in their product with a large flux (very short or very long lifetimes)
+    # Returns -inf where the probability is zero (below threshold, or a stable particle)
+    energy, m, width = np.broadcast_arrays(np.asarray(energy, dtype=np.float64),
+                                           np.asarray(m, dtype=np.float64),
+                                           np.asarray(width, dtype=np.float64))
+    above = energy > m
+    p = sqrt(np.where(above, (energy - m) * (energy + m), 1.0))
+    x_dist = l * width * m / (METER_BY_MEV * p)
+    x_len = dl * width * m / (METER_BY_MEV * p)
+
+    # log(1 - exp(-x)): expm1 where exp(-x) is close to 1, log1p where it is small
+    with np.errstate(divide='ignore'):
+        log_decay = np.where(x_len < np.log(2), log(-np.expm1(-x_len)), np.log1p(-exp(-np.maximum(x_len, np.log(2)))))
+    return np.where(above, -x_dist, -np.inf), np.where(above, log_decay, -np.inf)
+
+
+
+
+def decay_in_region_weights(energy, weight, m, width, l, dl):
+    # Weights weight * surv_prob * decay_prob and weight * surv_prob of decay_in_region_probs,
+    # combined in log space (decay_in_region_log_probs) so that they stay finite where the
+    # probabilities alone underflow
+    # Returns (decay_weight, surv_weight)
+    log_surv, log_decay = decay_in_region_log_probs(energy, m, width, l, dl)
+    weight = np.asarray(weight, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        log_weight = log(abs(weight))
+    return np.sign(weight) * exp(log_weight + log_surv + log_decay), np.sign(weight) * exp(log_weight + log_surv)
+
+
+
+
 def decay_quantile(u, p, m, width_gamma):
     # Quantile/PPF function to generate decay positions for a given lifetime and momentum.
     # momentum in lab frame p
@@ -35,22 +35,25 @@ def iprimakoff_nsigma(ea, g, ma, z, r0):
 def iprimakoff_sigma(ea, g, ma, z, r0 = 2.2e-10 / METER_BY_MEV):
     # inverse-Primakoff scattering total xs (Creswick et al)
     # r0: screening parameter
-    if ea < ma: return ea * 0
+    # ea and ma may be arrays; zero below threshold
     prefactor = (g * z)**2 / (2*137)
-    eta2 = r0**2 * (ea**2 - ma**2)
-    return heaviside(ea-ma, 0.0)*prefactor * (((2*eta2 + 1)/(4*eta2))*log(1+4*eta2) - 1)
+    eta2 = r0**2 * np.maximum(ea**2 - ma**2, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xs = prefactor * (((2*eta2 + 1)/(4*eta2))*log(1+4*eta2) - 1)
+    return np.where(eta2 > 0.0, xs, 0.0 * ea)
 
 
 def iprimakoff_sigma_massive(ea, Z, ma, g):
     """
     Debopam corrections on axion mass, similar to primakoff_sigma_massive in prod_xs.py
+    ea and Z may be arrays (e.g. Z = per_isotope(material.z, ea)); zero below threshold
     """
-    if ea < ma: return 0
     alpha = 1/137
-    pa = sqrt(ea**2 - ma**2)
+    pa = sqrt(np.maximum(ea**2 - ma**2, 0.0))
     Egamma = ea
-    ret = (alpha*Z**2*g**2*pa*(-4*Egamma*pa-(2*Egamma**2-ma**2)*(np.log(np.abs((2*Egamma*(Egamma-pa)-ma**2)/(2*Egamma*(Egamma+pa)-ma**2))))))/(16*Egamma**3)
-    return 2*ret
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret = (alpha*Z**2*g**2*pa*(-4*Egamma*pa-(2*Egamma**2-ma**2)*(np.log(np.abs((2*Egamma*(Egamma-pa)-ma**2)/(2*Egamma*(Egamma+pa)-ma**2))))))/(16*Egamma**3)
+    return np.where(ea < ma, 0.0, 2*ret)[()]
 
 
 
@@ -110,17 +113,34 @@ def icompton_sigma(ea, ma, g, z=1):
 
 
 
+def icompton_recoil_range(ea, ma):
+    # Kinematic range (et_min, et_max) of the electron kinetic energy in a + e- -> \gamma + e-
+    # ea and ma may be arrays; for ma = 0 it is (0, 2 ea^2 / (m_e + 2 ea))
+    s = M_E**2 + ma**2 + 2 * M_E * ea
+    pa = sqrt(np.maximum((ea - ma) * (ea + ma), 0.0))
+    e_cm = (ea + M_E) * (s + M_E**2) / (2 * s)  # electron energy of the CM frame boosted to the lab
+    p_cm = pa * (s - M_E**2) / (2 * s)
+    return np.maximum(e_cm - p_cm - M_E, 0.0), e_cm + p_cm - M_E
+
+
+
+
 def icompton_dsigma_det(ea, et, g, ma):
     # Inverse Compton differential cross section by electron recoil (a + e- -> \gamma + e-)
     # dSigma / dEt   electron kinetic energy
+    # Spin-averaged s- and u-channel amplitude of the pseudoscalar electron coupling g, in terms of
+    # s - m_e^2, u - m_e^2 and their sum ma^2 - t; zero outside icompton_recoil_range
     # ea: axion energy
     # et: transferred electron energy = E_e - m_e.
-    y = 2 * M_E * ea + ma ** 2
-    prefact = (1/137) * g ** 2 / (4 * M_E ** 2)
-    pa = np.sqrt(ea ** 2 - ma ** 2)
-    eg = ea - et
-    return -(prefact / pa) * (1 - (8 * M_E * eg / y) + (12 * (M_E * eg / y) ** 2)
-                                - (32 * M_E * (pa * ma) ** 2) * eg / (3 * y ** 3))
+    # ea and et may be arrays
+    et_min, et_max = icompton_recoil_range(ea, ma)
+    s_m = ma**2 + 2 * M_E * ea
+    u_m = -2 * M_E * (ea - et)
+    x = ma**2 + 2 * M_E * et
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amp2 = 8 * (M_E * ma * x / (s_m * u_m))**2 + (8 * ma**2 * (x - ma**2) - 4 * x**2) / (s_m * u_m)
+        dsigma = ALPHA * g**2 * amp2 / (16 * M_E * (ea - ma) * (ea + ma))
+    return np.where((ea > ma) & (et >= et_min) & (et <= et_max), dsigma, 0.0)[()]
 
 
 
@@ -190,19 +210,90 @@ def abs_nu_xsec_GT(ea, ma, g, nucl_ex, Ji=0, sigma=1e-2):
     return photo_energies, xsec
 
 
-def pair_production_sigma(Ea, ma, ge, mat: Material, n_samples=1000):
-    m2 = M2PairProduction(ma, mat.m[0], mat.n[0], mat.z[0]) # axion mass, nucleus mass, neutron number, atomic number
+class NuclearLevelTable:
+    """
+    Excitation levels of one nucleus sorted by energy, with cumulative GT strengths
+    Lets the levels inside any energy window be found with two searchsorted calls
+    :param nucl_ex: numpy 2Darray of (excitation energy, strength)
+    :param Ji: initial nuclear spin
+    """
+    def __init__(self, nucl_ex, Ji=0):
+        nucl_ex = np.atleast_2d(np.asarray(nucl_ex, dtype=np.float64))
+        order = np.argsort(nucl_ex[:,0], kind='stable')
+        self.energies = nucl_ex[order,0]
+        self.strengths = nucl_ex[order,1]
+        self.cum_strength = np.concatenate([[0.0], np.cumsum(self.strengths)])
+        self.Ji = Ji
+
+    def window(self, ea, sigma):
+        # [lo, hi) index range of the levels with ea - sigma < E < ea + sigma
+        lo = np.searchsorted(self.energies, ea - sigma, side='right')
+        hi = np.searchsorted(self.energies, ea + sigma, side='left')
+        return lo, np.maximum(hi, lo)
+
+
+def abs_nu_xsec_GT_vec(ea, ma, g, levels, Jis=None, sigma=1e-2):
+    """
+    abs_nu_xsec_GT for an array of axion energies, summed over nuclei, without Python loops over energies
+    :param ea: array of axion energies
+    :param levels: list of NuclearLevelTable, or of nucl_ex arrays together with Jis
+    :return: (cross section per axion energy [MeV^-2], de-excitation photon energies,
+        index into ea of the axion energy that produced each photon); photons are ordered by axion energy
+    """
+    ea = np.atleast_1d(np.asarray(ea, dtype=np.float64))
+    if Jis is not None:
+        levels = [NuclearLevelTable(lv, Ji) for lv, Ji in zip(levels, Jis)]
+    levels = [lv if isinstance(lv, NuclearLevelTable) else NuclearLevelTable(lv) for lv in levels]
+
+    above = ea > ma
+    pa = sqrt(np.maximum(ea**2 - ma**2, 0.0))
+    the_delta_fun = gaussian(ea, mu=ea, sigma=sigma)
+    gA = 1.27
 
-    tp = np.random.uniform(-15, -5, n_samples)
-    tm = np.random.uniform(-15, -5, n_samples)
+    xsec = np.zeros_like(ea)
+    photon_energies = []
+    photon_index = []
+    for lv in levels:
+        lo, hi = lv.window(ea, sigma)
+        hi = np.where(above, hi, lo)
+        total_strength = lv.cum_strength[hi] - lv.cum_strength[lo]
+        xsec += gA**2 * g**2 * np.pi/6 * the_delta_fun * pa * total_strength / (2*lv.Ji + 1)
+
+        # Gather the levels of every window: position k of window i is level lo[i] + k
+        counts = hi - lo
+        owner = np.repeat(np.arange(ea.shape[0]), counts)
+        starts = np.cumsum(counts) - counts
+        positions = np.arange(owner.shape[0]) - starts[owner] + lo[owner]
+        photon_energies.append(lv.energies[positions])
+        photon_index.append(owner)
+
+    photon_energies = np.concatenate(photon_energies) if levels else np.zeros(0)
+    photon_index = np.concatenate(photon_index) if levels else np.zeros(0, dtype=np.intp)
+    order = np.argsort(photon_index, kind='stable')
+    return xsec, photon_energies[order], photon_index[order]
+
+
+def pair_production_sigma(Ea, ma, ge, mat: Material, n_samples=1000, rng=None, method="mc"):
+    # method: "mc", or "sobol" / "halton" for scrambled quasi-random points (see sample_unit_cube)
+    m2 = M2PairProduction(ma, mat.m[0], mat.n[0], mat.z[0]) # axion mass, nucleus mass, neutron number, atomic number
+    rng = get_rng(rng)
+
+    if method == "mc":
+        tp = rng.uniform(-15, -5, n_samples)
+        tm = rng.uniform(-15, -5, n_samples)
+        phi = rng.uniform(0.0, 2*pi, n_samples)
+        ep = rng.uniform(M_E, Ea - M_E, n_samples)
+    else:
+        u = sample_unit_cube(n_samples, 4, method, rng)
+        tp = -15 + 10*u[:,0]
+        tm = -15 + 10*u[:,1]
+        phi = 2*pi*u[:,2]
+        ep = M_E + (Ea - 2*M_E)*u[:,3]
 
     tp = 10**tp
     tm = 10**tm
     mc_vol = tp * tm * (Ea - 2*M_E)*(2*pi)*(pi**2)*log(10)**2
 
-    phi = np.random.uniform(0.0, 2*pi, n_samples)
-    ep = np.random.uniform(M_E, Ea - M_E, n_samples)
-
     p1 = sqrt(ep**2 - M_E**2)
     em = Ea - ep
     p2 = sqrt(em**2 - M_E**2)
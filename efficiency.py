@@ -1,7 +1,7 @@
 # Efficiency class
 
 from .fmath import *
-from scipy.interpolate import interp1d
+interp1d = LazyImport("scipy.interpolate", "interp1d")
 
 EFF_TYPES = ['uniform', 'spline']
 
@@ -17,4 +17,5 @@ class Efficiency:
         if self.func_type == 'uniform':
             return 1.0
         elif self.func_type == 'spline':
-            return np.heaviside(self.eff_spline(energy), 0.0) * self.eff_spline(energy)
\ No newline at end of file
+            eff = self.eff_spline(energy)
+            return np.heaviside(eff, 0.0) * eff
\ No newline at end of file
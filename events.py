@@ -0,0 +1,301 @@
+# Columnar containers for simulated ALP events
+
+import numpy as np
+
+
+
+
+class FluxEventTable:
+    """
+    Struct-of-arrays table of simulated ALP events.
+    Columns are preallocated and filled in blocks; the column properties return views
+    of the filled rows, so event generators can read them without copying.
+    energy: ALP energy [MeV], angle: polar angle w.r.t. the beam axis [rad], mass: ALP mass [MeV],
+    flux: production weight, decay_weight / scatter_weight: weights after propagation
+    """
+    COLUMNS = ('energy', 'angle', 'mass', 'flux', 'decay_weight', 'scatter_weight')
+
+    def __init__(self, capacity=0, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._columns = {col: np.zeros(capacity, dtype=self.dtype) for col in self.COLUMNS}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return self._columns['energy'].shape[0]
+
+    def reserve(self, capacity):
+        # Grow every column to hold at least `capacity` rows, keeping the filled rows
+        if capacity <= self.capacity:
+            return
+        for col in self.COLUMNS:
+            new_col = np.zeros(capacity, dtype=self.dtype)
+            new_col[:self.size] = self._columns[col][:self.size]
+            self._columns[col] = new_col
+
+    def clear(self):
+        self.size = 0
+
+    def append(self, energy, flux, angle=0.0, mass=0.0):
+        """
+        Append a block of events; scalars are broadcast against the block
+        :param energy: ALP energies [MeV]
+        :param flux: production weights
+        :param angle: polar angles [rad]
+        :param mass: ALP masses [MeV]
+        """
+        energy, flux, angle, mass = np.broadcast_arrays(np.atleast_1d(energy), flux, angle, mass)
+        n = energy.shape[0]
+        if self.size + n > self.capacity:
+            self.reserve(max(self.size + n, 2*self.capacity))
+
+        rows = slice(self.size, self.size + n)
+        self._columns['energy'][rows] = energy
+        self._columns['flux'][rows] = flux
+        self._columns['angle'][rows] = angle
+        self._columns['mass'][rows] = mass
+        self._columns['decay_weight'][rows] = 0.0
+        self._columns['scatter_weight'][rows] = 0.0
+        self.size += n
+
+    def set_weights(self, decay_weight=None, scatter_weight=None):
+        if decay_weight is not None:
+            self._columns['decay_weight'][:self.size] = decay_weight
+        if scatter_weight is not None:
+            self._columns['scatter_weight'][:self.size] = scatter_weight
+
+    @property
+    def energy(self):
+        return self._columns['energy'][:self.size]
+
+    @property
+    def angle(self):
+        return self._columns['angle'][:self.size]
+
+    @property
+    def mass(self):
+        return self._columns['mass'][:self.size]
+
+    @property
+    def flux(self):
+        return self._columns['flux'][:self.size]
+
+    @property
+    def decay_weight(self):
+        return self._columns['decay_weight'][:self.size]
+
+    @property
+    def scatter_weight(self):
+        return self._columns['scatter_weight'][:self.size]
+
+    def sum_by_mass(self, values=None):
+        """
+        Sum a per-event quantity over the events sharing an ALP mass
+        :param values: array with the event axis last, defaults to the production weights
+        :return: (unique masses, sums with the event axis replaced by the mass axis)
+        """
+        values = self.flux if values is None else np.asarray(values)
+        masses, idx = np.unique(self.mass, return_inverse=True)
+        sums = np.zeros(values.shape[:-1] + masses.shape, dtype=np.result_type(values, np.float64))
+        np.add.at(sums.T, idx, values.T)
+        return masses, sums
+
+    def extend(self, other):
+        # Append all rows of another table, including its propagated weights
+        n = len(other)
+        if self.size + n > self.capacity:
+            self.reserve(max(self.size + n, 2*self.capacity))
+        for col in self.COLUMNS:
+            self._columns[col][self.size:self.size + n] = other._columns[col][:n]
+        self.size += n
+
+    def save(self, path):
+        # Write the filled rows to a .npz file, one array per column
+        np.savez(path, **{col: self._columns[col][:self.size] for col in self.COLUMNS})
+
+    @classmethod
+    def load(cls, path, dtype=None):
+        with np.load(path) as data:
+            dtype = data['energy'].dtype if dtype is None else dtype
+            table = cls(data['energy'].shape[0], dtype=dtype)
+            for col in cls.COLUMNS:
+                table._columns[col][:] = data[col]
+        table.size = table.capacity
+        return table
+
+
+
+
+def merge_event_tables(tables, dtype=None):
+    """
+    Concatenate partial event tables, e.g. the outputs of AxionFlux.simulate_shard on separate nodes
+    Shard weights are already normalized to the full run, so no rescaling is applied.
+    :param tables: iterable of FluxEventTable or paths to tables written with FluxEventTable.save
+    :return: a new FluxEventTable holding all rows in the given order
+    """
+    tables = [FluxEventTable.load(t) if not isinstance(t, FluxEventTable) else t for t in tables]
+    if dtype is None:
+        dtype = np.result_type(*[t.dtype for t in tables]) if tables else np.float64
+    merged = FluxEventTable(sum(len(t) for t in tables), dtype=dtype)
+    for t in tables:
+        merged.extend(t)
+    return merged
+
+
+
+
+class ThresholdScan:
+    """
+    Summed event weights above many energy thresholds, for many exposures, at once.
+    The events are sorted by energy once; each threshold is then a binary search into the reverse
+    cumulative sum of the weights, so threshold and exposure scans never revisit the events.
+    :param energy: event energies [MeV]
+    :param weights: event weights, one per energy
+    """
+    def __init__(self, energy, weights):
+        energy = np.asarray(energy, dtype=np.float64).ravel()
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), energy.shape)
+        order = np.argsort(energy, kind='stable')
+        self.energy = energy[order]
+        # tail[i]: sum of the weights of the sorted events i, i+1, ...; tail[-1] = 0 above every event
+        self.tail = np.zeros(energy.shape[0] + 1)
+        self.tail[:-1] = np.cumsum(weights[order][::-1])[::-1]
+
+    def __call__(self, thresholds, exposure=1.0):
+        """
+        :param thresholds: energy thresholds [MeV], any shape; events with energy >= threshold are counted
+        :param exposure: multiplicative exposure factors, any shape
+        :return: array of shape thresholds.shape + exposure.shape
+        """
+        counts = self.tail[np.searchsorted(self.energy, np.asarray(thresholds, dtype=np.float64), side='left')]
+        return np.multiply.outer(counts, np.asarray(exposure, dtype=np.float64))
+
+
+
+
+class HistogramSink:
+    """
+    Weighted 1D or 2D histogram filled while events are generated, in place of storing them.
+    Keeps the sum of weights and the sum of squared weights per bin, so memory depends only on the binning.
+    Linear- and log-uniform edges are indexed arithmetically in O(1); other edges fall back to searchsorted.
+    Sinks with the same edges merge by summation, e.g. across worker processes or shards.
+    :param edges: bin edges, one array per dimension, e.g. (energy_edges,) or (energy_edges, angle_edges)
+    """
+    def __init__(self, *edges):
+        if len(edges) not in (1, 2):
+            raise ValueError("HistogramSink takes edges for 1 or 2 dimensions, got {}".format(len(edges)))
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.shape = tuple(e.shape[0] - 1 for e in self.edges)
+        self.sumw = np.zeros(self.shape)
+        self.sumw2 = np.zeros(self.shape)
+        self._spacing = [self._detect_spacing(e) for e in self.edges]
+
+    @staticmethod
+    def _detect_spacing(edges):
+        if np.allclose(np.diff(edges), edges[1] - edges[0], rtol=1e-9, atol=0.0):
+            return "linear"
+        if edges[0] > 0 and np.allclose(np.diff(np.log(edges)), np.log(edges[1] / edges[0]), rtol=1e-9, atol=0.0):
+            return "log"
+        return None
+
+    @property
+    def ndim(self):
+        return len(self.edges)
+
+    def bin_index(self, axis, x):
+        # Bin index of each x along the given axis, -1 outside the histogram range (upper edge included)
+        edges = self.edges[axis]
+        nbins = self.shape[axis]
+        x = np.asarray(x, dtype=np.float64)
+        inside = (x >= edges[0]) & (x <= edges[-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self._spacing[axis] == "linear":
+                idx = np.floor((x - edges[0]) / (edges[1] - edges[0]))
+            elif self._spacing[axis] == "log":
+                idx = np.floor(np.log(x / edges[0]) / np.log(edges[1] / edges[0]))
+            else:
+                idx = np.searchsorted(edges, x, side='right') - 1
+        idx = np.clip(np.where(inside, idx, 0), 0, nbins - 1).astype(np.intp)
+        # Correct rounding right at the bin edges
+        idx -= (idx > 0) & (x < edges[idx])
+        idx += (idx < nbins - 1) & (x >= edges[np.minimum(idx + 1, nbins)])
+        return np.where(inside, idx, -1)
+
+    def fill(self, weights, *coords):
+        """
+        Accumulate weighted samples
+        :param weights: sample weights
+        :param coords: one coordinate array per dimension, broadcastable against weights
+        """
+        weights, *coords = np.broadcast_arrays(np.asarray(weights, dtype=np.float64), *coords)
+        idx = [self.bin_index(axis, c.ravel()) for axis, c in enumerate(coords)]
+        inside = np.all([i >= 0 for i in idx], axis=0)
+        flat = np.ravel_multi_index([i[inside] for i in idx], self.shape)
+        w = weights.ravel()[inside]
+        size = self.sumw.size
+        self.sumw += np.bincount(flat, weights=w, minlength=size).reshape(self.shape)
+        self.sumw2 += np.bincount(flat, weights=w**2, minlength=size).reshape(self.shape)
+
+    def fill_events(self, events: FluxEventTable, weights=None):
+        # Fill from an event table: energy, and angle for 2D sinks; weights default to the production flux
+        weights = events.flux if weights is None else weights
+        coords = (events.energy, events.angle)[:self.ndim]
+        self.fill(weights, *coords)
+
+    def clear(self):
+        self.sumw[...] = 0.0
+        self.sumw2[...] = 0.0
+
+    def __iadd__(self, other):
+        if other.shape != self.shape or not all(np.array_equal(a, b) for a, b in zip(self.edges, other.edges)):
+            raise ValueError("cannot merge histograms with different binning")
+        self.sumw += other.sumw
+        self.sumw2 += other.sumw2
+        return self
+
+    def errors(self):
+        # MC statistical uncertainty of each bin
+        return np.sqrt(self.sumw2)
+
+    def centers(self, axis=0):
+        edges = self.edges[axis]
+        if self._spacing[axis] == "log":
+            return np.sqrt(edges[1:] * edges[:-1])
+        return 0.5*(edges[1:] + edges[:-1])
+
+    def as_event_table(self, mass=0.0):
+        """
+        One event per filled bin at the bin center, carrying the bin's summed weight
+        Lets a binned flux go through the same propagate / event-rate code as an event table.
+        """
+        filled = self.sumw != 0.0
+        grids = np.meshgrid(*[self.centers(axis) for axis in range(self.ndim)], indexing='ij')
+        table = FluxEventTable(int(np.count_nonzero(filled)))
+        angle = grids[1][filled] if self.ndim == 2 else 0.0
+        table.append(grids[0][filled], self.sumw[filled], angle=angle, mass=mass)
+        return table
+
+    def save(self, path):
+        np.savez(path, sumw=self.sumw, sumw2=self.sumw2, **{"edges{}".format(i): e for i, e in enumerate(self.edges)})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            sink = cls(*[data["edges{}".format(i)] for i in range(data["sumw"].ndim)])
+            sink.sumw[...] = data["sumw"]
+            sink.sumw2[...] = data["sumw2"]
+        return sink
+
+
+
+
+def merge_histograms(sinks):
+    # Sum partial histograms (HistogramSink or paths written with HistogramSink.save) with identical binning
+    sinks = [HistogramSink.load(s) if not isinstance(s, HistogramSink) else s for s in sinks]
+    merged = HistogramSink(*sinks[0].edges)
+    for s in sinks:
+        merged += s
+    return merged
@@ -3,8 +3,8 @@ Classes and functions for performing fits an calculating limit contours
 """
 
 from .fmath import *
-from scipy.stats import chi2, norm
-from scipy.signal import savgol_filter
+chi2 = LazyImport("scipy.stats", "chi2")
+savgol_filter = LazyImport("scipy.signal", "savgol_filter")
 
 
 
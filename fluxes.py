@@ -9,6 +9,31 @@ from .decay import *
 from .prod_xs import *
 from .det_xs import *
 from .photon_xs import *
+from .events import FluxEventTable, HistogramSink, merge_event_tables, merge_histograms
+from .multipole import cached_multipole
+
+import os
+from collections import OrderedDict
+import math
+
+
+
+
+def iter_flux_chunks(source, chunk_size=100000):
+    """
+    Iterate over an input particle flux in chunks of rows
+    :param source: an (N, k) array, a path to a .npy file (memory mapped, read chunk by chunk),
+        or any iterable/generator yielding (n, k) arrays
+    :param chunk_size: number of rows per chunk for array and file sources
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = np.load(source, mmap_mode='r')
+    if isinstance(source, np.ndarray):
+        for i in range(0, source.shape[0], chunk_size):
+            yield np.asarray(source[i:i+chunk_size])
+    else:
+        for chunk in source:
+            yield np.asarray(chunk)
 
 
 
@@ -16,54 +41,212 @@ from .photon_xs import *
 class AxionFlux:
     # Generic superclass for constructing fluxes
     def __init__(self, axion_mass, target: Material, detector: Material,
-                    det_dist, det_length, det_area, nsamples=1000):
+                    det_dist, det_length, det_area, nsamples=1000, dtype=np.float64, seed=None):
         self.ma = axion_mass
-        self.target_z = target.z[0]  # TODO: take z array for compound mats
-        self.target_a = target.z[0] + target.n[0]
-        self.det_z = detector.z[0]
+        # per-isotope arrays of the target; xs are summed over them with target_sum,
+        # target_z / target_a / det_z being the fraction-weighted mean numbers per atom
+        self.target_zs = np.asarray(target.z, dtype=np.float64)
+        self.target_ns = np.asarray(target.n, dtype=np.float64)
+        self.target_frac = isotope_fractions(target)
+        self.target_z = np.sum(self.target_frac * self.target_zs)
+        self.target_a = np.sum(self.target_frac * (self.target_zs + self.target_ns))
+        self.det_z = np.sum(isotope_fractions(detector) * detector.z)
         self.target_density = target.density
         self.det_dist = det_dist  # meters
         self.det_length = det_length  # meters
         self.det_area = det_area  # square meters
-        self.axion_energy = []
-        self.axion_angle = []
-        self.axion_flux = []
-        self.decay_axion_weight = []
-        self.scatter_axion_weight = []
+        self.events = FluxEventTable(dtype=dtype)
         self.nsamples = nsamples
+        self.rng = get_rng(seed)
+        self.sampling = "uniform"
+        self.sampling_bins = 128
+        self._cdf_tables = OrderedDict()  # LRU of importance sampling tables, see draw_samples
+
+    def target_sum(self, xs, x):
+        # Fraction-weighted sum of xs(z) over the target isotopes in one call, broadcast against x
+        return isotope_sum(xs, x, self.target_zs, self.target_frac)
+
+    @property
+    def axion_energy(self):
+        return self.events.energy
+
+    @property
+    def axion_angle(self):
+        return self.events.angle
+
+    @property
+    def axion_flux(self):
+        return self.events.flux
+
+    @property
+    def decay_axion_weight(self):
+        return self.events.decay_weight
+
+    @decay_axion_weight.setter
+    def decay_axion_weight(self, weights):
+        self.events.set_weights(decay_weight=weights)
+
+    @property
+    def scatter_axion_weight(self):
+        return self.events.scatter_weight
+
+    @scatter_axion_weight.setter
+    def scatter_axion_weight(self, weights):
+        self.events.set_weights(scatter_weight=weights)
 
     def det_sa(self):
         return arctan(sqrt(self.det_area / pi) / self.det_dist)
 
+    def simulate_block(self, rows):
+        # Simulate a block of input flux rows, appending to the event table
+        raise NotImplementedError("{} does not support block simulation".format(type(self).__name__))
+
+    def simulate_stream(self, source, chunk_size=100000):
+        """
+        Simulate an input flux too large to hold in memory, reducing every chunk into the event table
+        :param source: array, path to a .npy file or iterable of row chunks (see iter_flux_chunks)
+        """
+        self.events.clear()
+        for chunk in iter_flux_chunks(source, chunk_size):
+            self.simulate_block(chunk)
+
+    def simulate_chunks(self, source, chunk_size=100000):
+        """
+        Generator over the chunks of an input flux, yielding the event table filled with that chunk only
+        The table is reused between chunks, so propagate and reduce it before requesting the next one
+        :param source: array, path to a .npy file or iterable of row chunks (see iter_flux_chunks)
+        """
+        for chunk in iter_flux_chunks(source, chunk_size):
+            self.events.clear()
+            self.simulate_block(chunk)
+            yield self.events
+
+    def simulate_histogram(self, sink: HistogramSink, source=None, chunk_size=None, weights=None):
+        """
+        Accumulate the simulated flux straight into a histogram instead of keeping the events
+        Only one chunk of events exists at a time, so memory is set by chunk_size and the binning, not by nsamples.
+        :param sink: HistogramSink binned in energy, or in (energy, angle)
+        :param source: input flux rows (see iter_flux_chunks), defaults to the flux given at construction
+        :param chunk_size: input rows per chunk, defaults to about 1e5 events per chunk
+        :param weights: optional function of the event table returning the weights to histogram,
+            e.g. lambda ev: ev.flux * efficiency(ev.energy); defaults to the production flux
+        :return: the filled sink
+        """
+        source = self.shard_rows() if source is None else source
+        if source is None:
+            raise NotImplementedError("{} does not support histogram simulation".format(type(self).__name__))
+        if chunk_size is None:
+            chunk_size = max(1, 100000 // max(1, self.nsamples))
+        for events in self.simulate_chunks(source, chunk_size):
+            sink.fill_events(events, None if weights is None else weights(events))
+        self.events.clear()
+        return sink
+
+    def shard_rows(self):
+        # Input flux rows divided between shards by simulate_shard; None if the flux has no row input
+        return None
+
+    def simulate_shard(self, shard_index, n_shards, seed=None):
+        """
+        Simulate one of n_shards disjoint pieces of the flux, e.g. one batch job of many
+        The input rows are split into contiguous shards and each shard draws from its own random stream
+        spawned from seed. The MC weights are normalized per input row, so concatenating the event tables
+        of all shards (merge_event_tables) reproduces a full simulate() run in distribution.
+        :param shard_index: index of this shard in [0, n_shards)
+        :param n_shards: total number of shards
+        :param seed: common seed shared by all shards of the run
+        :return: the event table filled with this shard
+        """
+        self.rng = shard_rng(seed, shard_index, n_shards)
+        rows = self.shard_rows()
+        if rows is None:
+            raise NotImplementedError("{} does not support sharded simulation".format(type(self).__name__))
+        self.events.clear()
+        self.simulate_block(np.array_split(np.atleast_2d(rows), n_shards)[shard_index])
+        return self.events
+
+    def set_sampling(self, sampling):
+        if sampling not in ("uniform", "importance"):
+            raise ValueError("sampling must be 'uniform' or 'importance', got {}".format(sampling))
+        self.sampling = sampling
+
+    def draw_samples(self, name, energies, func, lo, hi, log_bins=False):
+        """
+        Draw nsamples MC points on [lo, hi] for each input row
+        With sampling="importance" the points follow a tabulated inverse CDF of func, cached per
+        (input energies, ALP mass) in an LRU of the 64 most recently used tables. The production cross
+        sections scale as g^2, so the tables are shared between couplings.
+        :param name: cache tag of the integrand
+        :param energies: incoming particle energies of the rows, shape (n,)
+        :param func: integrand, called with an (n, nbins) array of points
+        :param lo: lower limits, scalar or (n,)
+        :param hi: upper limits, scalar or (n,)
+        :param log_bins: tabulate on log-spaced bins, for integrands peaked at the lower limit
+        :return: (points, volumes), both (n, nsamples); the volume of each point is hi-lo for uniform
+            sampling and 1/pdf for importance sampling, before dividing by nsamples
+        """
+        n = energies.shape[0]
+        lo = np.broadcast_to(lo, (n,))[:, np.newaxis]
+        hi = np.broadcast_to(hi, (n,))[:, np.newaxis]
+        if self.sampling == "importance":
+            key = (name, self.ma, energies.tobytes())
+            table = self._cdf_tables.get(key)
+            if table is None:
+                table = InverseCDFTable(func, lo[:,0], hi[:,0], nbins=self.sampling_bins, log_bins=log_bins)
+                self._cdf_tables[key] = table
+                if len(self._cdf_tables) > 64:
+                    self._cdf_tables.popitem(last=False)
+            else:
+                self._cdf_tables.move_to_end(key)
+            return table.sample(self.nsamples, self.rng)
+
+        points = self.rng.uniform(lo, hi, (n, self.nsamples))
+        return points, np.broadcast_to(hi - lo, points.shape)
+
+    def geom_accept(self):
+        # Fraction of an isotropic flux intercepted by the detector face
+        if getattr(self, 'is_isotropic', True):
+            return self.det_area / (4*pi*self.det_dist**2)
+        return 1.0
+
+    def propagate_weights(self, decay_width, rescale_factor=1.0):
+        """
+        Vectorized decay and survival weights
+        :param decay_width: decay width in MeV, broadcastable against the event axis (last axis),
+            e.g. a scalar, a per-event array or an (n, 1) array for n couplings
+        :param rescale_factor: flux rescaling factor, broadcastable like decay_width
+        :return: (decay weights, scatter weights) with the event axis last
+        """
+        e_a = np.asarray(self.axion_energy, dtype=np.float64)
+        m_a = np.asarray(self.events.mass, dtype=np.float64)
+        wgt = np.asarray(self.axion_flux, dtype=np.float64)
+
+        surv_prob, decay_prob = decay_in_region_probs(e_a, m_a, decay_width, self.det_dist, self.det_length)
+        scatter_wgt = rescale_factor * wgt * surv_prob  # removed g^2
+        return scatter_wgt * decay_prob, scatter_wgt
+
     def propagate(self, decay_width, rescale_factor=1.0):
-        e_a = np.array(self.axion_energy)
-        wgt = np.array(self.axion_flux)
-
-        # if (e_a**2 - self.ma**2).all() > 0:
-        if ((e_a**2 - self.ma**2) > 0).all():
-            # Get axion Lorentz transformations and kinematics
-            p_a = sqrt(e_a**2 - self.ma**2)
-            v_a = p_a / e_a
-            boost = e_a / self.ma
-            tau = boost / decay_width if decay_width > 0.0 else np.inf * np.ones_like(boost)
-            # Get decay and survival probabilities
-            surv_prob = np.array([np.exp(-self.det_dist / METER_BY_MEV / v_a[i] / tau[i]) \
-                            for i in range(len(v_a))])
-            decay_prob_exp = np.array([(1 - np.exp(-self.det_length / METER_BY_MEV / v_a[i] / tau[i])) \
-                            for i in range(len(v_a))])
-
-            decay_prob_taylor = np.array([(self.det_length / METER_BY_MEV / v_a[i] / tau[i]) \
-                            for i in range(len(v_a))])
-
-            # NOTE: one should use Taylor expansion to avoid numerical err
-            # decay_prob = decay_prob_exp
-            decay_prob = decay_prob_taylor
-
-            self.decay_axion_weight = np.asarray(rescale_factor * wgt * surv_prob * decay_prob, dtype=np.float32)  # removed g^2
-            self.scatter_axion_weight = np.asarray(rescale_factor * wgt * surv_prob, dtype=np.float32)  # removed g^2
-        else:
-            self.decay_axion_weight = np.asarray(wgt * 0, dtype=np.float32)
-            self.scatter_axion_weight = np.asarray(wgt * 0, dtype=np.float32)
+        decay_wgt, scatter_wgt = self.propagate_weights(decay_width, rescale_factor)
+        self.events.set_weights(decay_wgt, scatter_wgt)
+
+    def propagate_batch(self, couplings, width_func, coupling, totals=False):
+        """
+        Propagate the simulated flux for an array of couplings in a single pass
+        :param couplings: array of n couplings
+        :param width_func: decay width as a function of (coupling, mass), broadcasting in both
+        :param coupling: the coupling used during simulate()
+        :param totals: if True, return the per-coupling sums instead of the weight matrices
+        :return: (decay weights, scatter weights), each (n, n_events) or (n,) if totals
+        """
+        g = np.atleast_1d(np.asarray(couplings, dtype=np.float64))[:, np.newaxis]
+        widths = width_func(g, np.asarray(self.events.mass, dtype=np.float64))
+        decay_wgt, scatter_wgt = self.propagate_weights(widths, power(g/coupling, 2))
+        decay_wgt *= self.geom_accept()
+        scatter_wgt *= self.geom_accept()
+        if totals:
+            return np.sum(decay_wgt, axis=1), np.sum(scatter_wgt, axis=1)
+        return decay_wgt, scatter_wgt
+
 
 
 
@@ -89,17 +272,29 @@ class FluxPrimakoffIsotropic(AxionFlux):
     Generator for Primakoff-produced axion flux
     Takes in a flux of photons
     """
-    def __init__(self, photon_flux=[1,1], target=Material("W"), detector=Material("Ar"), det_dist=4.0,
-                    det_length=0.2, det_area=0.04, axion_mass=0.1, axion_coupling=1e-3, nsamples=1000):
-        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area)
+    def __init__(self, photon_flux=[1,1], target=None, detector=None, det_dist=4.0,
+                    det_length=0.2, det_area=0.04, axion_mass=0.1, axion_coupling=1e-3, nsamples=1000,
+                    dtype=np.float64, seed=None):
+        target = get_material("W") if target is None else target
+        detector = get_material("Ar") if detector is None else detector
+        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, dtype=dtype, seed=seed)
         self.photon_flux = photon_flux
         self.gagamma = axion_coupling
         self.nsamples = nsamples
-        self.target_photon_xs = AbsCrossSection(target)
+        self.target_photon_xs = shared_cross_section(AbsCrossSection, target)
+        self._photon_abs_sigma = None
 
     def decay_width(self, gagamma, ma):
         return W_gg(gagamma, ma)
 
+    def photon_abs_sigma(self):
+        # SM photon absorption cross section at each input photon energy [MeV^-2]
+        # It does not depend on the ALP mass, so it is cached for mass scans
+        if self._photon_abs_sigma is None or self._photon_abs_sigma[0] is not self.photon_flux:
+            energies = np.atleast_2d(self.photon_flux)[:,0]
+            self._photon_abs_sigma = (self.photon_flux, self.target_photon_xs.sigma_mev(energies))
+        return self._photon_abs_sigma[1]
+
     def photon_flux_dN_dE(self, energy):
         return np.interp(energy, self.photon_flux[:,0], self.photon_flux[:,1], left=0.0, right=0.0)
 
@@ -109,26 +304,56 @@ class FluxPrimakoffIsotropic(AxionFlux):
         if gamma_energy < self.ma:
             return
 
-        xs = primakoff_sigma(gamma_energy, self.gagamma, self.ma, self.target_z)
+        xs = self.target_sum(lambda z: primakoff_sigma(gamma_energy, self.gagamma, self.ma, z), gamma_energy)
         br = xs / self.target_photon_xs.sigma_mev(gamma_energy)
-        self.axion_energy.append(gamma_energy)
-        self.axion_flux.append(gamma_wgt * br)
+        self.events.append(gamma_energy, gamma_wgt * br, mass=self.ma)
 
-    def simulate(self):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
+    def simulate_block(self, photons):
+        # Vectorized simulate_single over a block of photons
+        photons = np.atleast_2d(photons)
+        photons = photons[photons[:,0] >= self.ma]
 
-        for i, el in enumerate(self.photon_flux):
-            self.simulate_single(el)
+        xs = self.target_sum(lambda z: primakoff_sigma(photons[:,0], self.gagamma, self.ma, z), photons[:,0])
+        br = xs / self.target_photon_xs.sigma_mev(photons[:,0])
+        self.events.append(photons[:,0], photons[:,1] * br, mass=self.ma)
+
+    def simulate(self):
+        self.events.clear()
+        self.simulate_block(self.photon_flux)
+
+    def shard_rows(self):
+        return self.photon_flux
+
+    def simulate_masses(self, masses):
+        """
+        Simulate the flux for an array of ALP masses in one broadcast over (mass x photon energy)
+        The mass of each event is stored in the mass column of the event table, which propagate uses
+        :param masses: array of ALP masses [MeV]
+        :return: the filled event table
+        """
+        masses = np.atleast_1d(masses)[:, np.newaxis]
+        photons = np.atleast_2d(self.photon_flux)
+        gamma_energy = photons[:,0]
+        gamma_wgt = photons[:,1]
+
+        above = gamma_energy >= masses
+        xs = self.target_sum(lambda z: primakoff_sigma(gamma_energy, self.gagamma, masses, z), above)
+        br = xs / self.photon_abs_sigma()
+
+        self.events.clear()
+        self.events.append(np.broadcast_to(gamma_energy, above.shape)[above], (gamma_wgt * br)[above],
+                           mass=np.broadcast_to(masses, above.shape)[above])
+        return self.events
+
+    def propagate_couplings(self, couplings, totals=False):
+        return self.propagate_batch(couplings, W_gg, self.gagamma, totals)
 
     def propagate(self, new_coupling=None):
         if new_coupling is not None:
             rescale=power(new_coupling/self.gagamma, 2)
-            super().propagate(W_gg(new_coupling, self.ma), rescale)
+            super().propagate(W_gg(new_coupling, self.events.mass), rescale)
         else:
-            super().propagate(W_gg(self.gagamma, self.ma))
+            super().propagate(W_gg(self.gagamma, self.events.mass))
         geom_accept = self.det_area / (4*pi*self.det_dist**2)
         self.decay_axion_weight *= geom_accept
         self.scatter_axion_weight *= geom_accept
@@ -156,14 +381,18 @@ class FluxComptonIsotropic(AxionFlux):
     Generator for axion flux from compton-like scattering
     Takes in a flux of photons
     """
-    def __init__(self, photon_flux=[1,1], target=Material("W"), detector=Material("Ar"), det_dist=4.,
-                    det_length=0.2, det_area=0.04, axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True):
-        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area)
+    def __init__(self, photon_flux=[1,1], target=None, detector=None, det_dist=4.,
+                    det_length=0.2, det_area=0.04, axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True,
+                    dtype=np.float64, seed=None, sampling="uniform"):
+        target = get_material("W") if target is None else target
+        detector = get_material("Ar") if detector is None else detector
+        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, dtype=dtype, seed=seed)
         self.photon_flux = photon_flux
         self.ge = axion_coupling
         self.nsamples = nsamples
-        self.target_photon_xs = AbsCrossSection(target)
+        self.target_photon_xs = shared_cross_section(AbsCrossSection, target)
         self.is_isotropic = is_isotropic
+        self.set_sampling(sampling)
 
     def decay_width(self, ge, ma):
         return W_ee(ge, ma)
@@ -176,28 +405,51 @@ class FluxComptonIsotropic(AxionFlux):
         if s < (M_E + self.ma)**2:
             return
 
-        ea_rnd = np.random.uniform(self.ma, gamma_energy, self.nsamples)
-        mc_xs = (gamma_energy - self.ma) * compton_dsigma_dea(ea_rnd, gamma_energy, self.ge, self.ma, self.target_z) / self.nsamples
+        ea_rnd = self.rng.uniform(self.ma, gamma_energy, self.nsamples)
+        mc_xs = (gamma_energy - self.ma) * self.target_sum(
+            lambda z: compton_dsigma_dea(ea_rnd, gamma_energy, self.ge, self.ma, z), ea_rnd) / self.nsamples
         diff_br = mc_xs / self.target_photon_xs.sigma_mev(gamma_energy)
 
-        for i in range(self.nsamples):
-            self.axion_energy.append(ea_rnd[i])
-            self.axion_flux.append(gamma_wgt * diff_br[i])
+        self.events.append(ea_rnd, gamma_wgt * diff_br, mass=self.ma)
+
+    def simulate_block(self, photons):
+        # Vectorized simulate_single over a block of photons
+        # Draws one (n_photons x nsamples) block of variates; photons below threshold are masked out
+        photons = np.atleast_2d(photons)
+        s = 2 * M_E * photons[:,0] + M_E ** 2
+        photons = photons[s >= (M_E + self.ma)**2]
+        gamma_energy = photons[:,0,np.newaxis]
+        gamma_wgt = photons[:,1,np.newaxis]
+
+        ea_rnd, mc_vol = self.draw_samples("compton", photons[:,0],
+                                           lambda ea: self.target_sum(
+                                               lambda z: compton_dsigma_dea(ea, gamma_energy, self.ge, self.ma, z), ea),
+                                           self.ma, photons[:,0], log_bins=self.ma > 0)
+        mc_xs = mc_vol * self.target_sum(lambda z: compton_dsigma_dea(ea_rnd, gamma_energy, self.ge, self.ma, z),
+                                          ea_rnd) / self.nsamples
+        diff_br = mc_xs / self.target_photon_xs.sigma_mev(gamma_energy)
 
-    def simulate(self):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
+        self.events.append(ea_rnd.ravel(), (gamma_wgt * diff_br).ravel(), mass=self.ma)
+
+    def simulate(self, block_size=1000):
+        # block_size: number of photon rows simulated at once, memory scales as block_size * nsamples
+        self.events.clear()
+        self.events.reserve(len(self.photon_flux) * self.nsamples)
+
+        for i in range(0, len(self.photon_flux), block_size):
+            self.simulate_block(self.photon_flux[i:i+block_size])
+
+    def shard_rows(self):
+        return self.photon_flux
 
-        for i, el in enumerate(self.photon_flux):
-            self.simulate_single(el)
+    def propagate_couplings(self, couplings, totals=False):
+        return self.propagate_batch(couplings, W_ee, self.ge, totals)
 
     def propagate(self, new_coupling=None):
         if new_coupling is not None:
-            super().propagate(W_ee(new_coupling, self.ma), rescale_factor=power(new_coupling/self.ge, 2))
+            super().propagate(W_ee(new_coupling, self.events.mass), rescale_factor=power(new_coupling/self.ge, 2))
         else:
-            super().propagate(W_ee(self.ge, self.ma))
+            super().propagate(W_ee(self.ge, self.events.mass))
 
         if self.is_isotropic:
             geom_accept = self.det_area / (4*pi*self.det_dist**2)
@@ -219,20 +471,24 @@ class FluxBremIsotropic(AxionFlux):
     Generator for axion-bremsstrahlung flux
     Takes in a flux of el
     """
-    def __init__(self, electron_flux=[1.,0.], positron_flux=[1.,0.], target=Material("W"), detector=Material("Ar"),
+    def __init__(self, electron_flux=[1.,0.], positron_flux=[1.,0.], target=None, detector=None,
                     target_density=19.3, target_radiation_length=6.76, target_length=10.0, det_dist=4., det_length=0.2,
-                    det_area=0.04, axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True):
-        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area)
+                    det_area=0.04, axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True,
+                    dtype=np.float64, seed=None, sampling="uniform"):
+        target = get_material("W") if target is None else target
+        detector = get_material("Ar") if detector is None else detector
+        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, dtype=dtype, seed=seed)
         # TODO: Replace A = 2*Z with real numbers of nucleons
         self.electron_flux = electron_flux
         self.positron_flux = positron_flux
         self.ge = axion_coupling
         self.target_density = target_density  # g/cm3
         self.target_radius = target_length  # cm
-        self.ntargets_by_area = target_length * target_density * AVOGADRO / (2*target.z[0])  # N_T / cm^2
-        self.ntarget_area_density = target_radiation_length * AVOGADRO / (2*target.z[0])
+        self.ntargets_by_area = target_length * target_density * AVOGADRO / (2*self.target_z)  # N_T / cm^2
+        self.ntarget_area_density = target_radiation_length * AVOGADRO / (2*self.target_z)
         self.nsamples = nsamples
         self.is_isotropic = is_isotropic
+        self.set_sampling(sampling)
 
     def decay_width(self):
         return W_ee(self.ge, self.ma)
@@ -255,28 +511,52 @@ class FluxBremIsotropic(AxionFlux):
         if ea_max < self.ma:
             return
 
-        ea_rnd = np.random.uniform(self.ma, ea_max, self.nsamples)
+        ea_rnd = self.rng.uniform(self.ma, ea_max, self.nsamples)
         mc_vol = (ea_max - self.ma)/self.nsamples
-        diff_br = (self.ntarget_area_density * HBARC**2) * mc_vol * brem_dsigma_dea(ea_rnd, el_energy, self.ge, self.ma, self.target_z)
+        diff_br = (self.ntarget_area_density * HBARC**2) * mc_vol \
+            * self.target_sum(lambda z: brem_dsigma_dea(ea_rnd, el_energy, self.ge, self.ma, z), ea_rnd)
 
-        for i in range(self.nsamples):
-            self.axion_energy.append(ea_rnd[i])
-            self.axion_flux.append(el_wgt * diff_br[i])
+        self.events.append(ea_rnd, el_wgt * diff_br, mass=self.ma)
 
-    def simulate(self):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
+    def simulate_block(self, electrons):
+        # Vectorized simulate_single over a block of electrons
+        # Draws one (n_electrons x nsamples) block of variates; electrons below threshold are masked out
+        electrons = np.atleast_2d(electrons)
+        ea_max = electrons[:,0] * (1 - power(self.ma/electrons[:,0], 2))
+        electrons = electrons[ea_max >= self.ma]
+        ea_max = ea_max[ea_max >= self.ma, np.newaxis]
+        el_energy = electrons[:,0,np.newaxis]
+        el_wgt = electrons[:,1,np.newaxis]
+
+        ea_rnd, mc_vol = self.draw_samples("brem", electrons[:,0],
+                                           lambda ea: self.target_sum(
+                                               lambda z: brem_dsigma_dea(ea, el_energy, self.ge, self.ma, z), ea),
+                                           self.ma, ea_max[:,0], log_bins=self.ma > 0)
+        mc_vol = mc_vol/self.nsamples
+        diff_br = (self.ntarget_area_density * HBARC**2) * mc_vol \
+            * self.target_sum(lambda z: brem_dsigma_dea(ea_rnd, el_energy, self.ge, self.ma, z), ea_rnd)
+
+        self.events.append(ea_rnd.ravel(), (el_wgt * diff_br).ravel(), mass=self.ma)
+
+    def simulate(self, block_size=1000):
+        # block_size: number of electron rows simulated at once, memory scales as block_size * nsamples
+        self.events.clear()
+        self.events.reserve(len(self.electron_flux) * self.nsamples)
+
+        for i in range(0, len(self.electron_flux), block_size):
+            self.simulate_block(self.electron_flux[i:i+block_size])
 
-        for i, el in enumerate(self.electron_flux):
-            self.simulate_single(el)
+    def shard_rows(self):
+        return self.electron_flux
+
+    def propagate_couplings(self, couplings, totals=False):
+        return self.propagate_batch(couplings, W_ee, self.ge, totals)
 
     def propagate(self, new_coupling=None):
         if new_coupling is not None:
-            super().propagate(W_ee(new_coupling, self.ma), rescale_factor=power(new_coupling/self.ge, 2))
+            super().propagate(W_ee(new_coupling, self.events.mass), rescale_factor=power(new_coupling/self.ge, 2))
         else:
-            super().propagate(W_ee(self.ge, self.ma))
+            super().propagate(W_ee(self.ge, self.events.mass))
 
         if self.is_isotropic:
             geom_accept = self.det_area / (4*pi*self.det_dist**2)
@@ -291,17 +571,19 @@ class FluxResonanceIsotropic(AxionFlux):
     Generator for e+ e- resonant ALP production flux
     Takes in a flux of positrons
     """
-    def __init__(self, positron_flux=[1.,0.], target=Material("W"), detector=Material("Ar"), target_length=10.0,
+    def __init__(self, positron_flux=[1.,0.], target=None, detector=None, target_length=10.0,
                  target_radiation_length=6.76, det_dist=4., det_length=0.2, det_area=0.04,
-                 axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True):
+                 axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True, dtype=np.float64, seed=None):
+        target = get_material("W") if target is None else target
+        detector = get_material("Ar") if detector is None else detector
         # TODO: make flux take in a Detector class and a Target class (possibly Material class?)
         # Replace A = 2*Z with real numbers of nucleons
-        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, nsamples)
+        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, nsamples, dtype, seed)
         self.positron_flux = positron_flux  # differential positron energy flux dR / dE+ / s
         self.positron_flux_bin_widths = positron_flux[1:,0] - positron_flux[:-1,0]
         self.ge = axion_coupling
         self.target_radius = target_length  # cm
-        self.ntarget_area_density = target_radiation_length * AVOGADRO / (2*target.z[0])  # N_T / cm^2
+        self.ntarget_area_density = target_radiation_length * AVOGADRO / (2*self.target_z)  # N_T / cm^2
         self.is_isotropic = is_isotropic
 
     def decay_width(self):
@@ -313,12 +595,21 @@ class FluxResonanceIsotropic(AxionFlux):
     def positron_flux_attenuated(self, t, energy_pos, energy_res):
         return self.positron_flux_dN_dE(energy_pos) * track_length_prob(energy_pos, energy_res, t)
 
-    def simulate(self):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
-
+    def simulate(self, method="mc"):
+        # method: "mc", or "sobol" / "halton" for scrambled quasi-random (E+, t) points
+        self.events.clear()
+        self.simulate_samples(self.nsamples, method)
+
+    def simulate_shard(self, shard_index, n_shards, seed=None, method="mc"):
+        # No input rows to split: each shard draws its share of the nsamples MC points instead
+        self.rng = shard_rng(seed, shard_index, n_shards)
+        self.events.clear()
+        self.simulate_samples(np.array_split(np.arange(self.nsamples), n_shards)[shard_index].size, method)
+        return self.events
+
+    def simulate_samples(self, n, method="mc"):
+        # Append the MC estimate from n of the nsamples draws, normalized to the full nsamples
+        # so that the weights of the shards of one run add up to the full estimate
         resonant_energy = -M_E + self.ma**2 / (2 * M_E)
         if resonant_energy + M_E < self.ma:
             return
@@ -329,21 +620,28 @@ class FluxResonanceIsotropic(AxionFlux):
         if resonant_energy > max(self.positron_flux[:,0]):
             return
 
-        e_rnd = np.random.uniform(resonant_energy, max(self.positron_flux[:,0]), self.nsamples)
-        t_rnd = np.random.uniform(0.0, 5.0, self.nsamples)
+        if method == "mc":
+            e_rnd = self.rng.uniform(resonant_energy, max(self.positron_flux[:,0]), n)
+            t_rnd = self.rng.uniform(0.0, 5.0, n)
+        else:
+            u = sample_unit_cube(n, 2, method, self.rng)
+            e_rnd = resonant_energy + (max(self.positron_flux[:,0]) - resonant_energy)*u[:,0]
+            t_rnd = 5.0*u[:,1]
         mc_vol = (5.0 - 0.0)*(max(self.positron_flux[:,0]) - resonant_energy)
 
         attenuated_flux = mc_vol*np.sum(self.positron_flux_attenuated(t_rnd, e_rnd, resonant_energy))/self.nsamples
         wgt = self.target_z * (self.ntarget_area_density * HBARC**2) * resonance_peak(self.ge) * attenuated_flux
 
-        self.axion_energy.append(self.ma**2 / (2 * M_E))
-        self.axion_flux.append(wgt)
+        self.events.append(self.ma**2 / (2 * M_E), wgt, mass=self.ma)
+
+    def propagate_couplings(self, couplings, totals=False):
+        return self.propagate_batch(couplings, W_ee, self.ge, totals)
 
     def propagate(self, new_coupling=None):
         if new_coupling is not None:
-            super().propagate(W_ee(new_coupling, self.ma), rescale_factor=power(new_coupling/self.ge, 2))
+            super().propagate(W_ee(new_coupling, self.events.mass), rescale_factor=power(new_coupling/self.ge, 2))
         else:
-            super().propagate(W_ee(self.ge, self.ma))
+            super().propagate(W_ee(self.ge, self.events.mass))
 
         if self.is_isotropic:
             geom_accept = self.det_area / (4*pi*self.det_dist**2)
@@ -359,17 +657,21 @@ class FluxPairAnnihilationIsotropic(AxionFlux):
     (e+ e- -> a gamma)
     Takes in a flux of positrons
     """
-    def __init__(self, positron_flux=[1.,0.], target=Material("W"), detector=Material("Ar"),
+    def __init__(self, positron_flux=[1.,0.], target=None, detector=None,
                  target_radiation_length=6.76, det_dist=4., det_length=0.2, det_area=0.04,
-                 axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True):
+                 axion_mass=0.1, axion_coupling=1e-3, nsamples=100, is_isotropic=True, dtype=np.float64, seed=None,
+                 sampling="uniform"):
+        target = get_material("W") if target is None else target
+        detector = get_material("Ar") if detector is None else detector
         # TODO: make flux take in a Detector class and a Target class (possibly Material class?)
         # Replace A = 2*Z with real numbers of nucleons
-        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, nsamples)
+        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, nsamples, dtype, seed)
         self.positron_flux = positron_flux  # differential positron energy flux dR / dE+ / s
         self.positron_flux_bin_widths = positron_flux[1:,0] - positron_flux[:-1,0]
         self.ge = axion_coupling
-        self.ntarget_area_density = target_radiation_length * AVOGADRO / (2*target.z[0])
+        self.ntarget_area_density = target_radiation_length * AVOGADRO / (2*self.target_z)
         self.is_isotropic = is_isotropic
+        self.set_sampling(sampling)
 
     def decay_width(self):
         return W_ee(self.ge, self.ma)
@@ -383,8 +685,9 @@ class FluxPairAnnihilationIsotropic(AxionFlux):
             return
 
         # Simulate ALPs produced in the CM frame
-        cm_cosines = np.random.uniform(-1, 1, self.nsamples)
-        cm_wgts = (self.ntarget_area_density * HBARC**2) * associated_dsigma_dcos_CM(cm_cosines, ep_lab, self.ma, self.ge, self.target_z)
+        cm_cosines = self.rng.uniform(-1, 1, self.nsamples)
+        cm_wgts = (self.ntarget_area_density * HBARC**2) * self.target_sum(
+            lambda z: associated_dsigma_dcos_CM(cm_cosines, ep_lab, self.ma, self.ge, z), cm_cosines)
 
         # Boost the ALPs to the lab frame and multiply weights by jacobian for the boost
         jacobian_cm_to_lab = power(2, 1.5) * power(1 + cm_cosines, 0.5)
@@ -397,25 +700,56 @@ class FluxPairAnnihilationIsotropic(AxionFlux):
         ea_lab = gamma*(ea_cm + beta*paz_cm)
         mc_volume = 2 / self.nsamples  # we integrated over cosThetaLab from -1 to 1
 
-        for i in range(self.nsamples):
-            self.axion_energy.append(ea_lab[i])
-            self.axion_flux.append(pos_wgt * jacobian_cm_to_lab[i] * cm_wgts[i] * mc_volume)
+        self.events.append(ea_lab, pos_wgt * jacobian_cm_to_lab * cm_wgts * mc_volume, mass=self.ma)
 
+    def simulate_block(self, positrons):
+        # Vectorized simulate_single over a block of positrons
+        # Draws one (n_positrons x nsamples) block of CM cosines; positrons below threshold are masked out
+        positrons = np.atleast_2d(positrons)
+        positrons = positrons[positrons[:,0] >= max((self.ma**2 - M_E**2)/(2*M_E), M_E)]
+        ep_lab = positrons[:,0,np.newaxis]
+        pos_wgt = positrons[:,1,np.newaxis]
 
-    def simulate(self):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
+        # Simulate ALPs produced in the CM frame
+        cm_cosines, mc_volume = self.draw_samples("pair", positrons[:,0],
+            lambda c: power(1 + c, 0.5) * self.target_sum(
+                lambda z: associated_dsigma_dcos_CM(c, ep_lab, self.ma, self.ge, z), c),
+            -1.0, 1.0)
+        cm_wgts = (self.ntarget_area_density * HBARC**2) * self.target_sum(
+            lambda z: associated_dsigma_dcos_CM(cm_cosines, ep_lab, self.ma, self.ge, z), cm_cosines)
+
+        # Boost the ALPs to the lab frame and multiply weights by jacobian for the boost
+        jacobian_cm_to_lab = power(2, 1.5) * power(1 + cm_cosines, 0.5)
+        ea_cm = sqrt(M_E * (ep_lab + M_E) / 2)
+        paz_cm = sqrt(M_E * (ep_lab + M_E) / 2 - self.ma**2) * cm_cosines
+        beta = sqrt(ep_lab**2 - M_E**2) / (M_E + ep_lab)
+        gamma = power(1-beta**2, -0.5)
+
+        # Get the lab frame energy distribution
+        ea_lab = gamma*(ea_cm + beta*paz_cm)
+        mc_volume = mc_volume / self.nsamples  # we integrated over cosThetaLab from -1 to 1
+
+        self.events.append(ea_lab.ravel(), (pos_wgt * jacobian_cm_to_lab * cm_wgts * mc_volume).ravel(), mass=self.ma)
+
+    def simulate(self, block_size=1000):
+        # block_size: number of positron rows simulated at once, memory scales as block_size * nsamples
+        self.events.clear()
+        self.events.reserve(len(self.positron_flux) * self.nsamples)
+
+        for i in range(0, len(self.positron_flux), block_size):
+            self.simulate_block(self.positron_flux[i:i+block_size])
+
+    def shard_rows(self):
+        return self.positron_flux
 
-        for i, el in enumerate(self.positron_flux):
-            self.simulate_single(el)
+    def propagate_couplings(self, couplings, totals=False):
+        return self.propagate_batch(couplings, W_ee, self.ge, totals)
 
     def propagate(self, new_coupling=None):
         if new_coupling is not None:
-            super().propagate(W_ee(new_coupling, self.ma), rescale_factor=power(new_coupling/self.ge, 2))
+            super().propagate(W_ee(new_coupling, self.events.mass), rescale_factor=power(new_coupling/self.ge, 2))
         else:
-            super().propagate(W_ee(self.ge, self.ma))
+            super().propagate(W_ee(self.ge, self.events.mass))
 
         if self.is_isotropic:
             geom_accept = self.det_area / (4*pi*self.det_dist**2)
@@ -430,10 +764,13 @@ class FluxNuclearIsotropic(AxionFlux):
     Takes in a rate (#/s) of nuclear decays for a specified nuclear transition
     Produces the associated ALP flux from a given branching ratio
     """
-    def __init__(self, transition_energy=1.0, decay_rate=0.0, target=Material("W"), detector=Material("Ar"),
+    def __init__(self, transition_energy=1.0, decay_rate=0.0, target=None, detector=None,
                  det_dist=4., det_length=0.2, det_area=0.04, is_isotropic=True, beta=1, eta=.5, delta=0,
-                 axion_mass=0.1, gagamma=1e-3, gann0=1e-3, gann1=1e-3, nsamples=100, transition_type=None):
-        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, nsamples)
+                 axion_mass=0.1, gagamma=1e-3, gann0=1e-3, gann1=1e-3, nsamples=100, transition_type=None,
+                 dtype=np.float64, seed=None):
+        target = get_material("W") if target is None else target
+        detector = get_material("Ar") if detector is None else detector
+        super().__init__(axion_mass, target, detector, det_dist, det_length, det_area, nsamples, dtype, seed)
         self.transition_energy = transition_energy
         self.transition_type = transition_type
         self.decay_rate = decay_rate
@@ -445,40 +782,49 @@ class FluxNuclearIsotropic(AxionFlux):
         self.delta = delta
         self.is_isotropic = is_isotropic
 
-    def br(self):
+    def br(self, ma=None):
+        # ma: ALP mass or array of masses, defaults to self.ma
         energy = self.transition_energy
         delta = self.delta
         beta = self.beta
         eta = self.eta
         j = int(self.transition_type[1])
-
-        if self.ma > energy:
-            return 0
+        ma = self.ma if ma is None else np.asarray(ma)
 
         mu0 = 0.88
         mu1 = 4.71
-        return ((j/(j+1)) / (1 + delta**2) / pi / ALPHA) \
-            * power(sqrt(energy**2 - self.ma**2)/energy, 2*j + 1) \
+        return heaviside(energy - ma, 1.0) * ((j/(j+1)) / (1 + delta**2) / pi / ALPHA) \
+            * power(sqrt(np.maximum(energy**2 - ma**2, 0.0))/energy, 2*j + 1) \
                 * power((self.gann0 * beta + self.gann1)/((mu0-0.5)*beta + (mu1 - eta)), 2)
 
     def simulate(self, scaling=1):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
-
-        self.axion_energy.append(self.transition_energy)
-        self.axion_flux.append(self.decay_rate * self.br() * scaling)
+        self.events.clear()
+        self.events.append(self.transition_energy, self.decay_rate * self.br() * scaling, mass=self.ma)
+
+    def simulate_shard(self, shard_index, n_shards, seed=None, scaling=1):
+        # The flux is a single deterministic line, produced by the first shard only
+        self.rng = shard_rng(seed, shard_index, n_shards)
+        self.events.clear()
+        if shard_index == 0:
+            self.simulate(scaling)
+        return self.events
+
+    def simulate_masses(self, masses, scaling=1):
+        """
+        Simulate the monoenergetic flux for an array of ALP masses at once, one event per mass
+        :param masses: array of ALP masses [MeV]
+        :return: the filled event table
+        """
+        masses = np.atleast_1d(masses)
+        self.events.clear()
+        self.events.append(self.transition_energy, self.decay_rate * self.br(masses) * scaling, mass=masses)
+        return self.events
 
     # legacy
     def simulateBR(self, scaling=1, gann=1, gp=0.3):
-        self.axion_energy = []
-        self.axion_flux = []
-        self.scatter_axion_weight = []
-        self.decay_axion_weight = []
-
-        self.axion_energy.append(self.transition_energy)
-        self.axion_flux.append(self.decay_rate * self.branching_ratio(gann,gp) * scaling)
+        self.events.clear()
+        self.events.append(self.transition_energy, self.decay_rate * self.branching_ratio(gann,gp) * scaling,
+                           mass=self.ma)
 
     # legacy
     def branching_ratio(self, gann=1, gp=0.3):
@@ -499,12 +845,15 @@ class FluxNuclearIsotropic(AxionFlux):
         else:
             return 0
 
+    def propagate_couplings(self, couplings, totals=False):
+        return self.propagate_batch(couplings, W_gg, self.gagamma, totals)
+
     def propagate(self, gagamma=None):
         if gagamma is not None:
             rescale=power(gagamma/self.gagamma, 2)
-            super().propagate(W_gg(gagamma, self.ma), rescale)
+            super().propagate(W_gg(gagamma, self.events.mass), rescale)
         else:
-            super().propagate(W_gg(self.gagamma, self.ma))
+            super().propagate(W_gg(self.gagamma, self.events.mass))
 
         if self.is_isotropic:
             geom_accept = self.det_area / (4*pi*self.det_dist**2)
@@ -514,7 +863,27 @@ class FluxNuclearIsotropic(AxionFlux):
     def propagate_nodecay(self):
         # No decay terms in scatter_axion_weight
         geom_accept = self.det_area / (4*pi*self.det_dist**2)
-        self.scatter_axion_weight = geom_accept * np.array(self.axion_flux)
+        self.scatter_axion_weight = geom_accept * self.axion_flux
+
+
+def coupling_grid_counts(flux: AxionFlux, couplings, event_factor, coupling_power=2, decays=False):
+    """
+    Event counts on a grid of couplings (and ALP masses, for a flux from simulate_masses) in one pass
+    The flux is propagated for all couplings at once with propagate_couplings. Everything else that does not
+    depend on the coupling (energies, cuts, detection cross section at unit coupling) is in event_factor.
+    :param event_factor: per-event factor, shape (n_events,)
+    :param coupling_power: the detection rate scales as g**coupling_power
+    :param decays: count decays in the detector instead of scatterings
+    :return: (masses, counts) with counts of shape (n_couplings, n_masses)
+    """
+    g = np.atleast_1d(np.asarray(couplings, dtype=np.float64))
+    decay_wgt, scatter_wgt = flux.propagate_couplings(g)
+    wgt = decay_wgt if decays else scatter_wgt
+    if coupling_power != 0:
+        wgt *= power(g, coupling_power)[:, np.newaxis]
+    return flux.events.sum_by_mass(wgt * event_factor)
+
+
 
 
 class ElectronEventGenerator:
@@ -523,18 +892,20 @@ class ElectronEventGenerator:
     """
     def __init__(self, flux: AxionFlux, detector: Material):
         self.flux = flux
-        self.det_z = detector.z[0]
+        self.det_zs = np.asarray(detector.z, dtype=np.float64)
+        self.det_frac = isotope_fractions(detector)
+        self.det_z = np.sum(self.det_frac * self.det_zs)  # mean atomic number per detector atom
         self.axion_energy = np.zeros_like(flux.axion_energy)
         self.decay_weights = np.zeros_like(flux.decay_axion_weight)
         self.scatter_weights = np.zeros_like(flux.scatter_axion_weight)
         self.pair_weights = np.zeros_like(flux.scatter_axion_weight)
         self.efficiency = None  # TODO: add efficiency info
         self.energy_threshold = None  # TODO: add threshold as member var
-        self.pair_xs = PairProdutionCrossSection(detector)
+        self.pair_xs = shared_cross_section(PairProdutionCrossSection, detector)
 
     def pair_production(self, ge, ma, ntargets, days_exposure, threshold):
         # TODO: remove this ad hoc XS and replace with real calc
-        self.axion_energy = np.array(self.flux.axion_energy)
+        self.axion_energy = self.flux.axion_energy
         self.pair_weights = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) \
             * (self.det_z * 5 * ge**2)*self.pair_xs.sigma_mev(self.axion_energy**2) \
                 * METER_BY_MEV**2 * self.flux.scatter_axion_weight * heaviside(self.axion_energy - threshold, 1.0) \
@@ -543,19 +914,41 @@ class ElectronEventGenerator:
         return res
 
     def compton(self, ge, ma, ntargets, days_exposure, threshold):
-        self.axion_energy = np.array(self.flux.axion_energy)
+        self.axion_energy = self.flux.axion_energy
         self.scatter_weights = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) \
-            * icompton_sigma(self.axion_energy, ma, ge, self.det_z) \
+            * isotope_sum(lambda z: icompton_sigma(self.axion_energy, ma, ge, z), self.axion_energy, self.det_zs,
+                          self.det_frac) \
                 * METER_BY_MEV**2 * self.flux.scatter_axion_weight * heaviside(self.axion_energy - threshold, 1.0)
         res = np.sum(self.scatter_weights)
         return res
 
     def decays(self, days_exposure, threshold):
-        self.axion_energy = np.array(self.flux.axion_energy)
+        self.axion_energy = self.flux.axion_energy
         self.decay_weights = days_exposure * S_PER_DAY * self.flux.decay_axion_weight * heaviside(self.axion_energy - threshold, 1.0)
         res = np.sum(self.decay_weights)
         return res
 
+    # Grid versions: the same event counts for an array of couplings ge, used both for the flux and
+    # the detection, at the ALP mass(es) of the simulated flux. They return (masses, counts[n_ge, n_masses]).
+    def pair_production_grid(self, couplings, ntargets, days_exposure, threshold):
+        energy = self.flux.axion_energy
+        factor = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) \
+            * (self.det_z * 5)*self.pair_xs.sigma_mev(energy**2) \
+                * METER_BY_MEV**2 * heaviside(energy - threshold, 1.0) * heaviside(energy - 2*M_E, 0.0)
+        return coupling_grid_counts(self.flux, couplings, factor)
+
+    def compton_grid(self, couplings, ntargets, days_exposure, threshold):
+        energy = self.flux.axion_energy
+        factor = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) \
+            * isotope_sum(lambda z: icompton_sigma(energy, self.flux.events.mass, 1.0, z), energy, self.det_zs,
+                          self.det_frac) \
+                * METER_BY_MEV**2 * heaviside(energy - threshold, 1.0)
+        return coupling_grid_counts(self.flux, couplings, factor)
+
+    def decays_grid(self, couplings, days_exposure, threshold):
+        factor = days_exposure * S_PER_DAY * heaviside(self.flux.axion_energy - threshold, 1.0)
+        return coupling_grid_counts(self.flux, couplings, factor, coupling_power=0, decays=True)
+
 
 
 
@@ -565,7 +958,9 @@ class PhotonEventGenerator:
     """
     def __init__(self, flux: AxionFlux, detector: Material):
         self.flux = flux
-        self.det_z = detector.z[0]
+        self.det_zs = np.asarray(detector.z, dtype=np.float64)
+        self.det_frac = isotope_fractions(detector)
+        self.det_z = np.sum(self.det_frac * self.det_zs)  # mean atomic number per detector atom
         self.axion_energy = np.zeros_like(flux.axion_energy)
         self.photon_energy = np.zeros_like(flux.axion_energy)
         self.decay_weights = np.zeros_like(flux.decay_axion_weight)
@@ -574,7 +969,7 @@ class PhotonEventGenerator:
         self.pair_weights = np.zeros_like(flux.scatter_axion_weight)
         self.efficiency = None  # TODO: add efficiency info
         self.energy_threshold = None  # TODO: add threshold as member var
-        self.pair_xs = PairProdutionCrossSection(detector)
+        self.pair_xs = shared_cross_section(PairProdutionCrossSection, detector)
 
     def propagate_isotropic(self, new_gagamma=1.0):
         #self.flux.propagate(W_gg(new_gagamma, self.flux.ma), rescale_factor=power(new_gagamma/self.flux.ge, 2))
@@ -586,23 +981,21 @@ class PhotonEventGenerator:
 
 
     def inverse_primakoff(self, gagamma, ma, ntargets, days_exposure, threshold):
-        self.axion_energy = np.array(self.flux.axion_energy)
+        self.axion_energy = self.flux.axion_energy
         self.scatter_weights = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) \
-            * iprimakoff_sigma(self.axion_energy, gagamma, ma, self.det_z) \
+            * isotope_sum(lambda z: iprimakoff_sigma(self.axion_energy, gagamma, ma, z), self.axion_energy, self.det_zs,
+                          self.det_frac) \
                 * METER_BY_MEV**2 * self.flux.scatter_axion_weight * heaviside(self.axion_energy - threshold, 1.0)
         res = np.sum(self.scatter_weights)
         return res
 
 
     def nucleus_absorption(self, gann, ma, ntargets, days_exposure, threshold, nucl_exes, Jis):
-        self.axion_energy = np.array(self.flux.axion_energy)
-
-        # sum over all nucleus
-        xsec_sum = 0
-        for nucl_ex, Ji in zip(nucl_exes, Jis):
-            # NOTE: nuclear transition is always single energy, so we take the 1st of self.axion_energy
-            photo_energy, xs = abs_nu_xsec_GT(self.axion_energy[0], ma, gann, nucl_ex, Ji)
-            xsec_sum += xs
+        # nucl_exes: level tables (arrays or NuclearLevelTable) of all nuclei, Jis: their initial spins
+        # Energy resolved: the cross section is evaluated at every flux energy, summed over all nuclei
+        self.axion_energy = self.flux.axion_energy
+        xsec_sum, self.deex_photon_energy, self.deex_photon_index = \
+            abs_nu_xsec_GT_vec(self.axion_energy, ma, gann, nucl_exes, Jis)
 
         self.absorption_weights = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) * xsec_sum \
                 * METER_BY_MEV**2 * self.flux.scatter_axion_weight * heaviside(self.axion_energy - threshold, 1.0)
@@ -610,12 +1003,17 @@ class PhotonEventGenerator:
         res = np.sum(self.absorption_weights)
         return res
 
-    def nucleus_absorption_multipole(self, gann, ma, ntargets, days_exposure, threshold, axion_mx):
-        self.axion_energy = np.array(self.flux.axion_energy)
+    def nucleus_absorption_multipole(self, gann, ma, ntargets, days_exposure, threshold, axion_mx, nucleus=None,
+                                     cache_file=None):
+        # nucleus, cache_file: label and JSON file of the persistent multipole memo, see cached_multipole
+        self.axion_energy = self.flux.axion_energy
 
         ea = self.axion_energy[0]
         the_delta_fun = gaussian(ea, mu=ea, sigma=1e-2)
+        axion_mx = cached_multipole(axion_mx, nucleus=nucleus, cache_file=cache_file)
         xs = axion_mx.get(ea, ma, gann) * the_delta_fun # cross section [MeV^-2]
+        if cache_file is not None:
+            axion_mx.save()
 
         self.absorption_weights = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) * xs \
                 * METER_BY_MEV**2 * self.flux.scatter_axion_weight * heaviside(self.axion_energy - threshold, 1.0)
@@ -625,11 +1023,25 @@ class PhotonEventGenerator:
 
 
     def decays(self, days_exposure, threshold):
-        self.axion_energy = np.array(self.flux.axion_energy)
+        self.axion_energy = self.flux.axion_energy
         self.decay_weights = days_exposure * S_PER_DAY * self.flux.decay_axion_weight * heaviside(self.axion_energy - threshold, 1.0)
         res = np.sum(self.decay_weights)
         return res
 
+    # Grid versions: the same event counts for an array of couplings gagamma, used both for the flux and
+    # the detection, at the ALP mass(es) of the simulated flux. They return (masses, counts[n_g, n_masses]).
+    def inverse_primakoff_grid(self, couplings, ntargets, days_exposure, threshold):
+        energy = self.flux.axion_energy
+        factor = days_exposure * S_PER_DAY * (ntargets / self.flux.det_area) \
+            * isotope_sum(lambda z: iprimakoff_sigma(energy, 1.0, self.flux.events.mass, z), energy, self.det_zs,
+                          self.det_frac) \
+                * METER_BY_MEV**2 * heaviside(energy - threshold, 1.0)
+        return coupling_grid_counts(self.flux, couplings, factor)
+
+    def decays_grid(self, couplings, days_exposure, threshold):
+        factor = days_exposure * S_PER_DAY * heaviside(self.flux.axion_energy - threshold, 1.0)
+        return coupling_grid_counts(self.flux, couplings, factor, coupling_power=0, decays=True)
+
 
 
 
@@ -638,7 +1050,7 @@ rho_chi = 0.4e6 #(* keV / cm^3 *)
 vesc = 544.0e6
 v0 = 220.0e6
 ve = 244.0e6
-nesc = erf(vesc/v0) - 2*(vesc/v0) * exp(-(vesc/v0)**2) * sqrt(pi)
+nesc = math.erf(vesc/v0) - 2*(vesc/v0) * exp(-(vesc/v0)**2) * sqrt(pi)
 
 def fv(v):  # Velocity profile ( v ~ [0,1] )
     return (1.0 / (nesc * np.power(pi,3/2) * v0**3)) * exp(-((v + ve)**2 / v0**2))
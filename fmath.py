@@ -3,20 +3,150 @@
 import numpy as np
 from numpy import log, log10, exp, pi, sqrt, power, \
     sin, cos, tan, arccos, arctan, arcsin, heaviside, dot, cross
-from scipy.integrate import quad, dblquad
-from scipy.special import exp1, erf, gamma
-from scipy.stats import norm, chisquare
+import importlib
+import warnings
 
-import mpmath as mp
-from mpmath import mpmathify, fsub
-mp.dps = 5
 
 
 
+class LazyImport:
+    """
+    Stand-in for module.name (or the module itself) that imports it on first call or attribute access
+    scipy.stats and mpmath take a large share of the package import time and most jobs never touch them.
+    """
+    def __init__(self, module, name=None):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = target if self._name is None else getattr(target, self._name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return "<lazy {}{}>".format(self._module, "" if self._name is None else "." + self._name)
+
+
+quad = LazyImport("scipy.integrate", "quad")
+dblquad = LazyImport("scipy.integrate", "dblquad")
+exp1 = LazyImport("scipy.special", "exp1")
+erf = LazyImport("scipy.special", "erf")
+gamma = LazyImport("scipy.special", "gamma")
+norm = LazyImport("scipy.stats", "norm")
+chisquare = LazyImport("scipy.stats", "chisquare")
+qmc = LazyImport("scipy.stats.qmc")
+
+mp = LazyImport("mpmath")
+mpmathify = LazyImport("mpmath", "mpmathify")
+fsub = LazyImport("mpmath", "fsub")
+
+
+
+
+class GlobalRNG:
+    # Picklable stand-in for the np.random module, forwarding to numpy's global state
+    def __getattr__(self, name):
+        return getattr(np.random, name)
+
+global_rng = GlobalRNG()
+
+
+
+
+def get_rng(seed=None):
+    """
+    Random number source used by the MC samplers
+    :param seed: None to use numpy's global state (so np.random.seed still applies),
+        an int or SeedSequence to build a new Generator, or an existing Generator / RandomState
+    :return: object exposing uniform(), random(), normal()
+    """
+    if seed is None or seed is np.random:
+        return global_rng
+    if isinstance(seed, GlobalRNG):
+        return seed
+    if isinstance(seed, (np.random.Generator, np.random.RandomState)):
+        return seed
+    return np.random.default_rng(seed)
+
+
+
+
+def shard_rng(seed, shard_index, n_shards):
+    """
+    Independent random stream for one shard of a simulation split over n_shards jobs
+    Streams are spawned from a common SeedSequence, so every shard is reproducible from (seed, shard_index)
+    and no two shards overlap.
+    """
+    if not 0 <= shard_index < n_shards:
+        raise ValueError("shard_index must be in [0, n_shards), got {} of {}".format(shard_index, n_shards))
+    return np.random.default_rng(np.random.SeedSequence(seed).spawn(n_shards)[shard_index])
+
+
+
+
+def sample_unit_cube(n_samples, dim, method="mc", rng=None):
+    """
+    Points in the unit hypercube [0, 1)^dim for MC integration
+    :param method: "mc" for pseudo-random points, "sobol" or "halton" for scrambled low-discrepancy
+        sequences; scrambling makes every call an independent randomized QMC estimate
+    :param rng: seed or Generator, see get_rng
+    :return: (n_samples, dim) array
+    """
+    if method == "mc":
+        return get_rng(rng).uniform(0.0, 1.0, (n_samples, dim))
+
+    seed = get_rng(rng)
+    if isinstance(seed, GlobalRNG):
+        # Draw the scrambling seed from the global state so np.random.seed still applies
+        seed = np.random.randint(2**31 - 1)
+    if method == "sobol":
+        engine = qmc.Sobol(dim, scramble=True, seed=seed)
+    elif method == "halton":
+        engine = qmc.Halton(dim, scramble=True, seed=seed)
+    else:
+        raise ValueError("method must be 'mc', 'sobol' or 'halton', got {}".format(method))
+    with warnings.catch_warnings():
+        # Sobol balance is best at powers of 2, any n_samples still gives a valid estimate
+        warnings.simplefilter("ignore", UserWarning)
+        return engine.random(n_samples)
+
+
 
-def fastMC1D(func, a, b, n_samples, **kwargs):
+
+def rqmc_integrate(func, lo, hi, n_samples, n_replicas=8, method="sobol", rng=None):
+    """
+    Randomized QMC integral of func over the box [lo, hi] with an error estimate
+    Each replica uses an independently scrambled sequence of n_samples points; the spread of the
+    replica estimates gives the standard error.
+    :param func: integrand taking an (n, dim) array of points and returning n values
+    :param lo: lower box corner, length dim
+    :param hi: upper box corner, length dim
+    :return: (estimate, standard error)
+    """
+    lo = np.atleast_1d(np.asarray(lo, dtype=np.float64))
+    hi = np.atleast_1d(np.asarray(hi, dtype=np.float64))
+    rng = get_rng(rng)
+    volume = np.prod(hi - lo)
+    estimates = np.array([volume * np.mean(func(lo + (hi - lo) * sample_unit_cube(n_samples, lo.shape[0], method, rng)))
+                          for _ in range(n_replicas)])
+    return np.mean(estimates), np.std(estimates, ddof=1) / sqrt(n_replicas)
+
+
+
+
+def fastMC1D(func, a, b, n_samples, rng=None, **kwargs):
     # Fast 1D monte carlo, regenerating random variates each time
-    vars = np.random.uniform(a, b, n_samples)
+    vars = get_rng(rng).uniform(a, b, n_samples)
     return (b-a)*np.sum(func(vars, kwargs))/n_samples
 
 
@@ -43,4 +173,174 @@ def lorentz_boost(momentum, v):
                     [-gamma*beta*n[0], 1+(gamma-1)*n[0]*n[0], (gamma-1)*n[0]*n[1], (gamma-1)*n[0]*n[2]],
                     [-gamma*beta*n[1], (gamma-1)*n[1]*n[0], 1+(gamma-1)*n[1]*n[1], (gamma-1)*n[1]*n[2]],
                     [-gamma*beta*n[2], (gamma-1)*n[2]*n[0], (gamma-1)*n[2]*n[1], 1+(gamma-1)*n[2]*n[2]]])
-    return mat @ momentum
\ No newline at end of file
+    return mat @ momentum
+
+
+
+class InverseCDFTable:
+    """
+    Tabulated importance-sampling densities on [lo, hi], one per row
+    The integrand is evaluated at the centers of nbins equal bins and turned into a piecewise-constant pdf,
+    mixed with a fraction `mix` of the uniform pdf so that every point of [lo, hi] keeps a nonzero density
+    and the 1/pdf weighted estimate stays unbiased even where the table misses narrow features.
+    :param func: integrand, called with an (n, nbins) array of bin centers; only |func| matters
+    :param lo: lower limits, shape (n,)
+    :param hi: upper limits, shape (n,)
+    :param log_bins: use log-spaced bins (requires lo > 0), for integrands peaked towards lo
+    """
+    def __init__(self, func, lo, hi, nbins=64, mix=0.1, log_bins=False):
+        lo = np.atleast_1d(np.asarray(lo, dtype=np.float64))
+        hi = np.atleast_1d(np.asarray(hi, dtype=np.float64))
+        lo, hi = np.broadcast_arrays(lo, hi)
+        self.nbins = nbins
+        if log_bins:
+            self.edges = lo[:, np.newaxis] * power((hi / lo)[:, np.newaxis], np.linspace(0.0, 1.0, nbins + 1))
+        else:
+            self.edges = lo[:, np.newaxis] + (hi - lo)[:, np.newaxis] * np.linspace(0.0, 1.0, nbins + 1)
+        self.edges[:, 0] = lo
+        self.edges[:, -1] = hi
+        widths = self.edges[:, 1:] - self.edges[:, :-1]
+        centers = 0.5*(self.edges[:, 1:] + self.edges[:, :-1])
+
+        bin_mass = np.abs(func(centers)) * widths
+        total = np.sum(bin_mass, axis=1, keepdims=True)
+        uniform = widths / np.sum(widths, axis=1, keepdims=True)
+        probs = np.divide(bin_mass, total, out=uniform.copy(), where=total > 0.0)
+        self.probs = (1 - mix)*probs + mix*uniform
+        self.cdf = np.cumsum(self.probs, axis=1)
+        self.cdf[:, -1] = 1.0
+        self.density = np.divide(self.probs, widths, out=np.zeros_like(widths), where=widths > 0.0)
+
+    def sample(self, nsamples, rng=None):
+        """
+        Draw nsamples points per row
+        :return: (points, weights), both (n, nsamples); weights are 1/pdf, so
+            sum(weights * f(points)) / nsamples estimates the integral of f over [lo, hi]
+        """
+        n = self.cdf.shape[0]
+        u = get_rng(rng).uniform(0.0, 1.0, (n, nsamples))
+
+        # Row-wise searchsorted: offset each row's CDF by its row index and search the flattened table
+        offsets = np.arange(n)[:, np.newaxis]
+        idx = np.searchsorted((self.cdf + offsets).ravel(), (u + offsets).ravel(), side='right')
+        idx = np.minimum(idx.reshape(n, nsamples) - offsets * self.nbins, self.nbins - 1)
+
+        # Reuse the variate for the position inside the chosen bin
+        rows = np.broadcast_to(offsets, idx.shape)
+        p = self.probs[rows, idx]
+        cdf_lo = self.cdf[rows, idx] - p
+        frac = np.clip((u - cdf_lo) / p, 0.0, 1.0)
+        left = self.edges[rows, idx]
+        points = left + frac * (self.edges[rows, idx + 1] - left)
+        density = self.density[rows, idx]
+        weights = np.divide(1.0, density, out=np.zeros_like(density), where=density > 0.0)
+        return points, weights
+
+
+
+
+# Batch size from which index arithmetic beats np.interp's binary search on a uniform grid
+INTERP_ARITHMETIC_MIN_SIZE = 256
+
+
+class Interpolator1D:
+    """
+    Piecewise-linear interpolation of a fixed table, optionally in log10 of either axis
+    The (log) grids and slopes are computed once. On a uniform grid, large batches find their interval
+    by index arithmetic; otherwise np.interp's binary search on the stored grids is used, which is faster
+    for small batches. Outside the table the end values are returned, as with np.interp.
+    :param x: increasing abscissae, at least two
+    :param y: ordinates
+    :param log_x: interpolate in log10(x)
+    :param log_y: interpolate in log10(y) and return 10**result
+    """
+    def __init__(self, x, y, log_x=False, log_y=False):
+        self.log_x = log_x
+        self.log_y = log_y
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        with np.errstate(divide='ignore'):
+            self._set_grids(log10(x) if log_x else x, log10(y) if log_y else y)
+
+    def _set_grids(self, gx, gy, slopes=None):
+        self.gx = gx
+        self.gy = gy
+        if slopes is None:
+            with np.errstate(invalid='ignore'):
+                slopes = np.diff(gy) / np.diff(gx)
+        self.slopes = slopes
+        self.finite = bool(np.all(np.isfinite(gy)))
+        steps = np.diff(gx)
+        self.step = steps[0] if np.allclose(steps, steps[0], rtol=1e-9, atol=0.0) else None
+
+    def scaled(self, factor):
+        # Interpolator of factor * y sharing this grid
+        other = Interpolator1D.__new__(Interpolator1D)
+        other.log_x = self.log_x
+        other.log_y = self.log_y
+        if self.log_y:
+            other._set_grids(self.gx, self.gy + log10(factor), self.slopes)
+        else:
+            other._set_grids(self.gx, self.gy * factor, self.slopes * factor)
+        return other
+
+    def grid_coordinate(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if self.log_x:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return log10(x)
+        return x
+
+    def interval(self, u):
+        # Index j of the interval [gx[j], gx[j+1]] containing u
+        n = len(self.gx)
+        if self.step is not None:
+            with np.errstate(invalid='ignore'):
+                j = np.floor((u - self.gx[0]) / self.step)
+            j = np.nan_to_num(j, nan=0.0).astype(np.intp)
+        else:
+            j = np.searchsorted(self.gx, u, side='right') - 1
+        return np.clip(j, 0, n - 2)
+
+    def __call__(self, x):
+        u = self.grid_coordinate(x)
+        if self.step is not None and self.finite and u.size >= INTERP_ARITHMETIC_MIN_SIZE:
+            u = np.clip(u, self.gx[0], self.gx[-1])
+            j = self.interval(u)
+            res = self.gy[j] + self.slopes[j] * (u - self.gx[j])
+        else:
+            res = np.interp(u, self.gx, self.gy)
+        return (power(10.0, res) if self.log_y else res)[()]
+
+
+class InterpolatorStack:
+    """
+    Several Interpolator1D tables (e.g. one per material) evaluated on the same points in one call
+    The grids are concatenated, each shifted past the end of the previous one, and every point is
+    clipped to its own table and shifted with it, so a single np.interp serves all tables.
+    :return: __call__(x) has shape (n_tables,) + shape of x
+    """
+    def __init__(self, interpolators):
+        interpolators = list(interpolators)
+        self.log_x = interpolators[0].log_x
+        self.log_y = interpolators[0].log_y
+        if any(f.log_x != self.log_x or f.log_y != self.log_y for f in interpolators):
+            raise ValueError("all interpolators of a stack must use the same log axes")
+        self.lo = np.array([f.gx[0] for f in interpolators])
+        self.hi = np.array([f.gx[-1] for f in interpolators])
+        self.shifts = np.concatenate(([0.0], np.cumsum(self.hi - self.lo + 1.0)[:-1])) - self.lo
+        self.keys = np.concatenate([f.gx + shift for f, shift in zip(interpolators, self.shifts)])
+        self.gy = np.concatenate([f.gy for f in interpolators])
+
+    def __len__(self):
+        return len(self.lo)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        column = (-1,) + (1,) * x.ndim
+        if self.log_x:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x = log10(x)
+        u = np.clip(x, self.lo.reshape(column), self.hi.reshape(column)) + self.shifts.reshape(column)
+        res = np.interp(u, self.keys, self.gy)
+        return power(10.0, res) if self.log_y else res
@@ -2,10 +2,10 @@
 Define form factors
 """
 
-from .materials import Material
+from .materials import Material, per_isotope
 from .constants import *
 from .fmath import *
-from scipy.special import spherical_jn
+spherical_jn = LazyImport("scipy.special", "spherical_jn")
 
 
 
@@ -40,9 +40,11 @@ class AtomicElasticFF:
         self.frac = material.frac
 
     def __call__(self, q):
+        # all isotopes at once: per-isotope arrays broadcast along a leading axis
         t = q**2
-        a = 184.15*np.power(2.718, -1/2)*np.power(self.z, -1/3) / M_E
-        return np.dot(self.frac, power(self.z*(t*a**2) / (1 + t*a**2), 2))
+        z = per_isotope(self.z, q)
+        a = 184.15*np.power(2.718, -1/2)*np.power(z, -1/3) / M_E
+        return np.sum(per_isotope(self.frac, q) * power(z*(t*a**2) / (1 + t*a**2), 2), axis=0)
 
 
 
@@ -58,8 +60,9 @@ class ElectronElasticFF:
 
     def __call__(self, q):
         t = q**2
-        a = 184.15*np.power(2.718, -1/2)*np.power(self.z, -1/3) / M_E
-        return np.dot(self.frac, power(self.z*(t*a**2) / (1 + t*a**2) - self.z, 2))
+        z = per_isotope(self.z, q)
+        a = 184.15*np.power(2.718, -1/2)*np.power(z, -1/3) / M_E
+        return np.sum(per_isotope(self.frac, q) * power(z*(t*a**2) / (1 + t*a**2) - z, 2), axis=0)
 
 
 
@@ -75,10 +78,11 @@ class NuclearHelmFF:
         self.frac = material.frac
 
     def __call__(self, q):
-        r = self.rn * (10 ** -15) / METER_BY_MEV
+        r = per_isotope(self.rn, q) * (10 ** -15) / METER_BY_MEV
         s = 0.9 * (10 ** -15) / METER_BY_MEV
         r0 = sqrt(5 / 3 * (r ** 2) - 5 * (s ** 2))
-        return np.dot(self.frac, (self.z * 3*spherical_jn(1, q*r0) / (q*r0) * exp((-(q*s)**2)/2))**2)
+        return np.sum(per_isotope(self.frac, q) * (per_isotope(self.z, q) * 3*spherical_jn(1, q*r0) / (q*r0)
+                                                   * exp((-(q*s)**2)/2))**2, axis=0)
 
 
 
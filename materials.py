@@ -5,7 +5,78 @@ from .constants import *
 from .fmath import *
 
 import json
-import pkg_resources
+from .resources import resource_path
+
+
+# data/mat_params.json is parsed once per process; the per-isotope arrays of each material
+# and the default-constructed materials are shared between all users
+_mat_params = {}
+_isotopes = {}
+_materials = {}
+
+
+def mat_params():
+    # Contents of data/mat_params.json, keyed by material name
+    if not _mat_params:
+        with open(resource_path('data/mat_params.json'), 'r') as f:
+            _mat_params.update(json.load(f))
+    return _mat_params
+
+
+def isotope_arrays(material_name):
+    """
+    Read-only contiguous per-isotope arrays (z, n, m, spin, frac) of a material, built once
+    """
+    if material_name not in _isotopes:
+        mat_info = mat_params()[material_name]
+        arrays = []
+        for key in ('z', 'n', 'm', 'spin', 'frac'):
+            arr = np.ascontiguousarray(mat_info[key])
+            arr.setflags(write=False)
+            arrays.append(arr)
+        _isotopes[material_name] = tuple(arrays)
+    return _isotopes[material_name]
+
+
+def per_isotope(values, x):
+    """
+    Reshape per-isotope values (n_iso,) to (n_iso, 1, ..., 1) so they broadcast against x,
+    e.g. np.sum(frac * xs(energy, per_isotope(z, energy)), axis=0) sums a compound in one call
+    """
+    values = np.asarray(values)
+    return values.reshape(values.shape + (1,) * np.ndim(x))
+
+
+def isotope_fractions(material):
+    # Number fractions of the isotopes of a material normalized to 1, equal fractions if none are tabulated
+    frac = np.asarray(material.frac, dtype=np.float64)
+    if np.sum(frac) <= 0.0:
+        return np.full(frac.shape, 1.0 / frac.size)
+    return frac / np.sum(frac)
+
+
+def isotope_sum(xs, x, z, frac=None):
+    """
+    Sum of xs(z) over the isotopes z in one broadcast call, z being reshaped against x with per_isotope;
+    with frac the isotopes are weighted by their fractions, e.g. to get the per-atom xs of a compound
+    :param xs: function of the per-isotope array z, broadcasting it against x
+    """
+    values = xs(per_isotope(np.asarray(z, dtype=np.float64), x))
+    if frac is not None:
+        values = per_isotope(frac, x) * values
+    return np.sum(values, axis=0)
+
+
+def get_material(material_name):
+    """
+    Interned Material with the default fiducial mass, volume and density, e.g. for default arguments;
+    the instance is shared, so it should not be modified
+    """
+    if material_name not in _materials:
+        _materials[material_name] = Material(material_name)
+    return _materials[material_name]
+
+
 
 
 class Material:
@@ -21,18 +92,13 @@ class Material:
         """
         self.mat_name = material_name
         self.efficiency = efficiency
-        fpath = pkg_resources.resource_filename(__name__, 'data/mat_params.json')
-        f = open(fpath, 'r')
-        mat_file = json.load(f)
-        f.close()
+        mat_file = mat_params()
         if material_name in mat_file:
             mat_info = mat_file[material_name]
             self.iso = mat_info['iso']
-            self.z = np.array(mat_info['z'])
-            self.n = np.array(mat_info['n'])
-            self.m = np.array(mat_info['m'])
-            self.Ji = np.array(mat_info['spin'])
-            self.frac = np.array(mat_info['frac'])
+            # per-isotope arrays, shared read-only between instances of the same material
+            self.z, self.n, self.m, self.Ji, self.frac = isotope_arrays(material_name)
+            self.a = self.z + self.n
             self.lattice_const = np.array([mat_info['lattice_const']])  # Angstroms
             self.cell_volume = np.array([mat_info['cell_volume']])  # Angstroms^3
             self.r0 = np.array([mat_info['atomic_radius']])  # Angstroms
@@ -60,8 +126,9 @@ class Efficiency:
     """
     def __init__(self, eff_data=None):
         self.eff_data = eff_data
+        self.interp = Interpolator1D(eff_data[:,0], eff_data[:,1]) if eff_data is not None else None
 
     def __call__(self, energy):
-        if self.eff_data is not None:
-            return np.interp(energy, self.eff_data[:,0], self.eff_data[:,1])
+        if self.interp is not None:
+            return self.interp(energy)
         return 1.0
\ No newline at end of file
@@ -0,0 +1,180 @@
+# Memoization of nuclear multipole absorption cross sections (e.g. kshell_multipole's AxionMultipoleXsec)
+
+import os
+import json
+import tempfile
+import weakref
+import importlib
+from collections import OrderedDict
+
+
+
+
+# Multipole cross section backend, "module:attribute", resolved on first use so that importing
+# the generators does not require (or pay for) the backend package
+MULTIPOLE_BACKEND = "kshell_multipole.multipole_xsec_base:AxionMultipoleXsec"
+_backend = {}
+
+
+def set_multipole_backend(backend):
+    # backend: "module:attribute" path or the backend class itself
+    _backend.clear()
+    if isinstance(backend, str):
+        global MULTIPOLE_BACKEND
+        MULTIPOLE_BACKEND = backend
+    else:
+        _backend['class'] = backend
+
+
+def multipole_backend():
+    """
+    The multipole cross section class, imported the first time it is needed
+    :raises ImportError: if the backend package is not installed
+    """
+    if 'class' not in _backend:
+        module_name, attr = MULTIPOLE_BACKEND.split(':')
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as e:
+            raise ImportError("multipole absorption needs the backend {} ({}); install it or call "
+                              "set_multipole_backend".format(MULTIPOLE_BACKEND, e)) from e
+        _backend['class'] = getattr(module, attr)
+    return _backend['class']
+
+
+
+
+class CachedMultipoleXsec:
+    """
+    LRU-memoized wrapper around a multipole cross section backend exposing get(ea, ma, gann[, interaction]).
+    The backend is evaluated once per (nucleus, interaction, ea, ma) at unit coupling; the cross section
+    scales as gann^2, which is applied analytically, so scans over gann never call the backend again.
+    :param xsec: backend object
+    :param nucleus: label of the nucleus used in the cache key, defaults to xsec.nucleus; required for
+        persistence (save/load/cache_file), since a file may hold the entries of several nuclei
+    :param maxsize: maximum number of cached entries, least recently used entries are evicted first
+    :param cache_file: optional JSON file the cache is loaded from and written to by save(), which
+        only rewrites it when new entries were evaluated since the last save
+    """
+    def __init__(self, xsec, nucleus=None, maxsize=4096, cache_file=None):
+        self.xsec = xsec
+        nucleus = nucleus if nucleus is not None else getattr(xsec, 'nucleus', None)
+        self.nucleus = None if nucleus is None else str(nucleus)
+        self.maxsize = maxsize
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._unsaved = False  # entries evaluated since cache_file was last written
+        if cache_file is not None:
+            self._check_nucleus()
+            if os.path.exists(cache_file):
+                self.load(cache_file)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def key(self, ea, ma, interaction=None):
+        return self.nucleus, interaction, float(ea), float(ma)
+
+    def get(self, ea, ma, gann, interaction=None):
+        key = self.key(ea, ma, interaction)
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            xs = self._cache[key]
+        else:
+            self.misses += 1
+            xs = self._evaluate(ea, ma, interaction)
+            self._insert(key, xs)
+            self._unsaved = True
+        return gann**2 * xs
+
+    def _evaluate(self, ea, ma, interaction):
+        if interaction is None:
+            return float(self.xsec.get(ea, ma, 1.0))
+        return float(self.xsec.get(ea, ma, 1.0, interaction))
+
+    def _check_nucleus(self):
+        if self.nucleus is None:
+            raise ValueError("persistent multipole cache of {} needs a nucleus label; pass nucleus=..."
+                             .format(type(self.xsec).__name__))
+
+    def _insert(self, key, xs):
+        self._cache[key] = xs
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+    def save(self, path=None):
+        # Write the cache as JSON rows (nucleus, interaction, ea, ma, xs at unit coupling),
+        # keeping the rows of other nuclei already in the file; cache_file is left alone when it
+        # already holds every entry. The file is replaced atomically, so readers never see a partial one.
+        path = self.cache_file if path is None else path
+        if path is None:
+            raise ValueError("no cache file given")
+        self._check_nucleus()
+        is_cache_file = path == self.cache_file
+        if is_cache_file and not self._unsaved and os.path.exists(path):
+            return
+        rows = []
+        if os.path.exists(path):
+            with open(path) as f:
+                rows = [row for row in json.load(f) if row[0] != self.nucleus]
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            json.dump(rows + [list(key) + [xs] for key, xs in self._cache.items()], f)
+        os.replace(f.name, path)
+        if is_cache_file:
+            self._unsaved = False
+
+    def load(self, path):
+        # Merge entries from a saved cache; entries of other nuclei are ignored
+        self._check_nucleus()
+        with open(path) as f:
+            rows = json.load(f)
+        for nucleus, interaction, ea, ma, xs in rows:
+            if nucleus == self.nucleus:
+                self._insert((nucleus, interaction, ea, ma), xs)
+
+
+
+
+# One cache per backend object, so repeated calls with the same backend share their results
+_cached_backends = weakref.WeakKeyDictionary()
+
+
+def cached_multipole(xsec, nucleus=None, cache_file=None, **kwargs):
+    """
+    Return the memoized wrapper of a multipole backend, creating it on first use
+    :param nucleus: nucleus label of the cache key, see CachedMultipoleXsec
+    :param cache_file: JSON file to persist the cache in; an existing wrapper without one adopts it
+    :param kwargs: passed to CachedMultipoleXsec when the wrapper is created
+    """
+    if not isinstance(xsec, CachedMultipoleXsec):
+        try:
+            wrapper = _cached_backends.get(xsec)
+        except TypeError:
+            # Backend not weak-referenceable or not hashable: cache for this call only
+            return CachedMultipoleXsec(xsec, nucleus=nucleus, cache_file=cache_file, **kwargs)
+        if wrapper is None:
+            wrapper = CachedMultipoleXsec(xsec, nucleus=nucleus, cache_file=cache_file, **kwargs)
+            _cached_backends[xsec] = wrapper
+            return wrapper
+        xsec = wrapper
+
+    if nucleus is not None and xsec.nucleus != str(nucleus):
+        if xsec.nucleus is not None:
+            raise ValueError("multipole backend already cached as nucleus {}, not {}".format(xsec.nucleus, nucleus))
+        # same backend object, so the entries computed so far belong to this nucleus
+        xsec.nucleus = str(nucleus)
+        xsec._cache = OrderedDict(((xsec.nucleus,) + key[1:], xs) for key, xs in xsec._cache.items())
+    if cache_file is not None and cache_file != xsec.cache_file:
+        xsec._check_nucleus()
+        xsec.cache_file = cache_file
+        xsec._unsaved = len(xsec) > 0
+        if os.path.exists(cache_file):
+            xsec.load(cache_file)
+    return xsec
@@ -0,0 +1,199 @@
+# Process-parallel simulation with inputs and outputs held in shared memory
+
+import copy
+import numpy as np
+import multiprocessing as multi
+from multiprocessing import shared_memory
+
+
+
+
+class SharedArray:
+    """
+    numpy array backed by a named shared memory block
+    Created once in the parent process and attached by name in the workers, so the data is never pickled
+    """
+    def __init__(self, shape, dtype=np.float64, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        nbytes = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=nbytes)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def from_array(cls, arr, dtype=np.float64):
+        arr = np.asarray(arr, dtype=dtype)
+        shared = cls(arr.shape, dtype)
+        shared.array[...] = arr
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def spec(self):
+        return self.shm.name, self.shape, self.dtype.str
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+
+
+# Per-process state, set once by the pool initializer
+_worker = {}
+
+
+def _init_worker(instance, method_name, in_spec, out_spec, count_spec, max_rows, block=False):
+    _worker['method'] = getattr(instance, method_name)
+    _worker['inputs'] = SharedArray.attach(in_spec)
+    _worker['outputs'] = SharedArray.attach(out_spec)
+    _worker['counts'] = SharedArray.attach(count_spec)
+    _worker['max_rows'] = max_rows
+    _worker['block'] = block
+
+
+def _init_reduce_worker(instance, method_name, in_spec, args):
+    _worker['method'] = getattr(instance, method_name)
+    _worker['inputs'] = SharedArray.attach(in_spec)
+    _worker['args'] = args
+
+
+def _seed_instance(seed_seq):
+    instance = getattr(_worker['method'], '__self__', None)
+    if instance is not None and hasattr(instance, 'rng'):
+        # Each range draws from its own stream; forked workers would otherwise share one state
+        instance.rng = np.random.default_rng(seed_seq)
+
+
+def _reduce_range(task):
+    # Evaluate the method on the block of input rows [start, stop) and return its (small) result
+    start, stop, seed_seq = task
+    _seed_instance(seed_seq)
+    return _worker['method'](_worker['inputs'].array[start:stop], *_worker['args'])
+
+
+def _run_range(task):
+    # Evaluate the method on input rows [start, stop) and write the results in place
+    start, stop, seed_seq = task
+    inputs = _worker['inputs'].array
+    outputs = _worker['outputs'].array
+    counts = _worker['counts'].array
+    max_rows = _worker['max_rows']
+    _seed_instance(seed_seq)
+    if _worker['block']:
+        _write_block(start, stop, *_worker['method'](inputs[start:stop]))
+        return
+    for i in range(start, stop):
+        columns = _worker['method'](inputs[i])
+        n = len(columns[0])
+        if n > 0:
+            outputs[i*max_rows:i*max_rows + n] = np.column_stack(columns)
+        counts[i] = n
+
+
+def _write_block(start, stop, index, *columns):
+    # Block methods return the position of every output row within the block, followed by the columns;
+    # the rows of input i go to slots i*max_rows, i*max_rows + 1, ...
+    outputs = _worker['outputs'].array
+    max_rows = _worker['max_rows']
+    index = np.asarray(index, dtype=np.intp)
+    order = np.argsort(index, kind='stable')
+    index = index[order]
+    counts = np.bincount(index, minlength=stop - start)
+    rank = np.arange(len(index)) - (np.cumsum(counts) - counts)[index]
+    if len(index) > 0:
+        outputs[(start + index)*max_rows + rank] = np.column_stack(columns)[order]
+    _worker['counts'].array[start:stop] = counts
+
+
+
+
+def _worker_copy(instance, exclude):
+    # Strip large members from the copy shipped to the workers
+    worker_instance = copy.copy(instance)
+    for attr in exclude:
+        setattr(worker_instance, attr, None)
+    return worker_instance
+
+
+def _ranges(n_inputs, nworkers, chunksize, seed):
+    # Index ranges dispatched to the workers, each with its own SeedSequence
+    if chunksize is None:
+        chunksize = max(1, -(-n_inputs // (4*nworkers)))
+    starts = range(0, n_inputs, chunksize)
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(i, min(i + chunksize, n_inputs), ss) for i, ss in zip(starts, seed_seqs)]
+
+
+def shared_map(instance, method_name, inputs, ncols, max_rows=1, nworkers=None, chunksize=None, exclude=(),
+               seed=None, block=False):
+    """
+    Evaluate instance.method_name on every input row in a process pool
+    The input table and the output buffer live in shared memory; workers receive index ranges
+    and write their results straight into the preallocated output.
+    :param instance: object whose method is evaluated, sent once per worker
+    :param method_name: method taking one input row and returning ncols sequences of equal length,
+        or with block=True a method taking a block of rows and returning (index, *columns), where index
+        gives the row within the block that each output row belongs to
+    :param inputs: (N, k) input table
+    :param ncols: number of output columns
+    :param max_rows: maximum number of output rows per input row
+    :param nworkers: number of worker processes, defaults to cpu_count() - 1
+    :param chunksize: input rows per dispatched range
+    :param exclude: attributes of instance not needed by the workers (e.g. the input table itself)
+    :param seed: seed of the SeedSequence from which every dispatched range gets an independent
+        random stream (set as instance.rng), so the result depends only on seed and chunksize
+    :param block: pass each dispatched range to the method as one block, for vectorized methods
+    :return: (M, ncols) array of the outputs in input order
+    """
+    inputs = np.atleast_2d(np.asarray(inputs, dtype=np.float64))
+    n_inputs = inputs.shape[0]
+    nworkers = max(1, multi.cpu_count()-1) if nworkers is None else nworkers
+    worker_instance = _worker_copy(instance, exclude)
+
+    shared_in = SharedArray.from_array(inputs)
+    shared_out = SharedArray((n_inputs*max_rows, ncols))
+    shared_counts = SharedArray((n_inputs,), dtype=np.int64)
+    try:
+        ranges = _ranges(n_inputs, nworkers, chunksize, seed)
+        with multi.Pool(nworkers, initializer=_init_worker,
+                        initargs=(worker_instance, method_name, shared_in.spec(), shared_out.spec(),
+                                  shared_counts.spec(), max_rows, block)) as pool:
+            pool.map(_run_range, ranges)
+
+        filled = np.arange(max_rows) < shared_counts.array[:, np.newaxis]
+        return shared_out.array.reshape(n_inputs, max_rows, ncols)[filled]
+    finally:
+        shared_in.close()
+        shared_out.close()
+        shared_counts.close()
+
+
+
+
+def shared_reduce(instance, method_name, inputs, args=(), nworkers=None, chunksize=None, exclude=(), seed=None):
+    """
+    Evaluate instance.method_name(inputs[start:stop], *args) over index ranges of an input table in a process pool
+    Like shared_map, the input table lives in shared memory and the instance and args are sent once per
+    worker, so each task carries only its index range; for methods returning a small per-range result,
+    e.g. a partial HistogramSink, which is sent back to the parent
+    :return: list of the per-range results in input order
+    """
+    inputs = np.atleast_2d(np.asarray(inputs, dtype=np.float64))
+    nworkers = max(1, multi.cpu_count()-1) if nworkers is None else nworkers
+    worker_instance = _worker_copy(instance, exclude)
+
+    shared_in = SharedArray.from_array(inputs)
+    try:
+        ranges = _ranges(inputs.shape[0], nworkers, chunksize, seed)
+        with multi.Pool(nworkers, initializer=_init_reduce_worker,
+                        initargs=(worker_instance, method_name, shared_in.spec(), args)) as pool:
+            return pool.map(_reduce_range, ranges)
+    finally:
+        shared_in.close()
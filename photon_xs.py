@@ -1,6 +1,6 @@
 # Get the total photon absorption cross-section by element
 
-import pkg_resources
+from .resources import load_table
 
 from .materials import Material
 from .constants import *
@@ -8,6 +8,58 @@ from .fmath import *
 
 
 
+# Process-wide registry of the NIST XCOM tables, keyed by (table type, material name).
+# Each text file is parsed, deduplicated and log-transformed once; every cross section object built
+# afterwards shares the same read-only arrays.
+NIST_TABLE_PATHS = {
+    "absorption": "data/photon_absorption/photon_abs_{}.txt",
+    "pair_production": "data/photon_pair_production/pair_production_xs_{}.txt",
+    "compton": "data/photon_compton/compton_xs_{}.txt",
+}
+_nist_tables = {}
+_shared_xs = {}
+
+
+class NISTTable:
+    """
+    Read-only NIST XCOM table
+    data: [photon energy (MeV), cross section] rows with duplicate energies removed
+    interpolator: log-log Interpolator1D of the cross section; log_energy, log_xs are its grids
+    """
+    def __init__(self, data):
+        self.data = data[np.unique(data[:, 0], return_index=True)[1]]
+        self.interpolator = Interpolator1D(self.data[:, 0], self.data[:, 1], log_x=True, log_y=True)
+        self.log_energy = self.interpolator.gx
+        self.log_xs = self.interpolator.gy
+        for arr in (self.data, self.log_energy, self.log_xs, self.interpolator.slopes):
+            arr.setflags(write=False)
+
+
+def nist_table(table_type, mat_name):
+    """
+    Return the shared NISTTable of a material, reading it from the package data on first use
+    :param table_type: "absorption", "pair_production" or "compton"
+    """
+    key = (table_type, mat_name)
+    if key not in _nist_tables:
+        data = load_table(NIST_TABLE_PATHS[table_type].format(mat_name), skip_header=3)
+        _nist_tables[key] = NISTTable(data)
+    return _nist_tables[key]
+
+
+def shared_cross_section(xs_class, material: Material):
+    """
+    Return the process-wide instance of xs_class for this material, e.g.
+    shared_cross_section(AbsCrossSection, Material("W")); the instances are read-only and built once
+    """
+    key = (xs_class, material.mat_name)
+    if key not in _shared_xs:
+        _shared_xs[key] = xs_class(material)
+    return _shared_xs[key]
+
+
+
+
 """
 Returns the total photon absorption cross-section in cm2 as a function of E in MeV.
 material: Material class specifying the material, e.g. "Ge", "CsI", etc.
@@ -20,10 +72,9 @@ class AbsCrossSection:
         #self.pe_data = np.empty()
         self.xs_dim = 1e-24  # barns to cm2
         self.mat_name = material.mat_name
-        self.path_prefix = "data/photon_absorption/photon_abs_"
-        self.file_extension = ".txt"
-        fpath = pkg_resources.resource_filename(__name__, self.path_prefix + self.mat_name + self.file_extension)
-        self.pe_data = np.genfromtxt(fpath, skip_header=3)
+        self.table = nist_table("absorption", self.mat_name)
+        self.threshold = 0.0
+        self.pe_data = self.table.data
 
         if self.mat_name == "NaI":
             self.xs_dim = 149.89 / AVOGADRO  # (cm2 / g  * g / mol  * mol / N)
@@ -31,17 +82,18 @@ class AbsCrossSection:
             self.xs_dim = 259.81 / AVOGADRO  # (cm2 / g  * g / mol  * mol / N)
         elif self.mat_name == "CH2":
             self.xs_dim = 259.81 / AVOGADRO  # (cm2 / g  * g / mol  * mol / N)
-        
-        self.cleanPEData()
+
+        self.sigma_interp = self.table.interpolator.scaled(self.xs_dim)
     
     def cleanPEData(self):
+        # Deduplication is done once by the table registry
         self.pe_data = self.pe_data[np.unique(self.pe_data[:, 0], return_index=True)[1]]
 
     def sigma_cm2(self, E):
-        return 10**np.interp(log10(E), log10(self.pe_data[:,0]), log10(self.xs_dim * self.pe_data[:,1]))
+        return self.sigma_interp(E)
     
     def sigma_mev(self, E):
-        return 10**np.interp(log10(E), log10(self.pe_data[:,0]), log10(self.xs_dim * self.pe_data[:,1])) / MEV2_CM2
+        return self.sigma_interp(E) / MEV2_CM2
     
     def mu(self, E, n):  # atomic number density in cm^-3
         return self.sigma(E) * n
@@ -52,26 +104,26 @@ class PairProdutionCrossSection:
     def __init__(self, material: Material):
         self.xs_dim = 1e-24  # barns to cm2
         self.mat_name = material.mat_name
-        self.path_prefix = "data/photon_pair_production/pair_production_xs_"
-        self.file_extension = ".txt"
-        fpath = pkg_resources.resource_filename(__name__, self.path_prefix + self.mat_name + self.file_extension)
-        self.xs_data = np.genfromtxt(fpath, skip_header=3)
+        self.table = nist_table("pair_production", self.mat_name)
+        self.threshold = 2*M_E
+        self.xs_data = self.table.data
 
         if self.mat_name == "NaI":
             self.xs_dim = 149.89 / AVOGADRO  # (cm2 / g  * g / mol  * mol / N)
         elif self.mat_name == "CsI":
             self.xs_dim = 259.81 / AVOGADRO  # (cm2 / g  * g / mol  * mol / N)
-        
-        self.cleanPEData()
+
+        self.sigma_interp = self.table.interpolator.scaled(self.xs_dim)
     
     def cleanPEData(self):
+        # Deduplication is done once by the table registry
         self.xs_data = self.xs_data[np.unique(self.xs_data[:, 0], return_index=True)[1]]
 
     def sigma_cm2(self, E):
-        return heaviside(E-2*M_E,0.0) * 10**np.interp(log10(E), log10(self.xs_data[:,0]), log10(self.xs_dim * self.xs_data[:,1]))
+        return heaviside(E-self.threshold,0.0) * self.sigma_interp(E)
     
     def sigma_mev(self, E):
-        return heaviside(E-2*M_E,0.0) * 10**np.interp(log10(E), log10(self.xs_data[:,0]), log10(self.xs_dim * self.xs_data[:,1] / MEV2_CM2))
+        return heaviside(E-self.threshold,0.0) * self.sigma_interp(E) / MEV2_CM2
     
     def mu(self, E, n):  # atomic number density in cm^-3
         return self.sigma_cm2(E) * n
@@ -83,21 +135,44 @@ class ComptonCrossSection:
     def __init__(self, material: Material):
         self.xs_dim = 1e-24  # barns to cm2
         self.mat_name = material.mat_name
-        self.path_prefix = "data/photon_compton/compton_xs_"
-        self.file_extension = ".txt"
-        fpath = pkg_resources.resource_filename(__name__, self.path_prefix + self.mat_name + self.file_extension)
-        self.xs_data = np.genfromtxt(fpath, skip_header=3)
-        
-        self.cleanPEData()
+        self.table = nist_table("compton", self.mat_name)
+        self.threshold = 0.0
+        self.xs_data = self.table.data
+        self.sigma_interp = self.table.interpolator.scaled(self.xs_dim)
     
     def cleanPEData(self):
+        # Deduplication is done once by the table registry
         self.xs_data = self.xs_data[np.unique(self.xs_data[:, 0], return_index=True)[1]]
 
     def sigma_cm2(self, E):
-        return 10**np.interp(log10(E), log10(self.xs_data[:,0]), log10(self.xs_dim * self.xs_data[:,1]))
+        return self.sigma_interp(E)
     
     def sigma_mev(self, E):
-        return 10**np.interp(log10(E), log10(self.xs_data[:,0]), log10(self.xs_dim * self.xs_data[:,1] / MEV2_CM2))
+        return self.sigma_interp(E) / MEV2_CM2
     
     def mu(self, E, n):  # atomic number density in cm^-3
-        return self.sigma_cm2(E) * n
\ No newline at end of file
+        return self.sigma_cm2(E) * n
+
+
+
+
+class CrossSectionStack:
+    """
+    Several photon cross sections (e.g. one per material) evaluated on the same energies in one call
+    :param cross_sections: AbsCrossSection, PairProdutionCrossSection or ComptonCrossSection instances
+    sigma_cm2(E), sigma_mev(E) have shape (len(cross_sections),) + shape of E
+    """
+    def __init__(self, cross_sections):
+        self.cross_sections = list(cross_sections)
+        self.interp = InterpolatorStack([xs.sigma_interp for xs in self.cross_sections])
+        self.thresholds = np.array([xs.threshold for xs in self.cross_sections])
+
+    def sigma_cm2(self, E):
+        E = np.asarray(E, dtype=np.float64)
+        sigma = self.interp(E)
+        if np.any(self.thresholds > 0.0):
+            sigma = np.where(E > self.thresholds.reshape((-1,) + (1,) * E.ndim), sigma, 0.0)
+        return sigma
+
+    def sigma_mev(self, E):
+        return self.sigma_cm2(E) / MEV2_CM2
\ No newline at end of file
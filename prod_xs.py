@@ -65,12 +65,13 @@ class PrimakoffSigmaFF:
 
 def primakoff_dsigma_dtheta(theta, energy, z, ma, g=1):
     # Primakoff scattering production diffxs by theta (γ + A -> a + A)
-    if energy < ma:
-        return 0
-    pa = sqrt(energy**2 - ma**2)
+    # theta and energy may be arrays (broadcast against each other); zero below threshold
+    pa = sqrt(np.maximum(energy**2 - ma**2, 0.0))
     t = 2*energy*(pa*cos(theta) - energy) + ma**2
     ff = 1 #_nuclear_ff(t, ma, z, 2*z)
-    return ALPHA * (g * z * ff * pa**2 / t)**2 * sin(theta)**3 / 4
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dsigma = ALPHA * (g * z * ff * pa**2 / t)**2 * sin(theta)**3 / 4
+    return np.where(energy < ma, 0.0, dsigma)[()]
 
 
 
@@ -108,12 +109,14 @@ def primakoff_sigma(eg, g, ma, z, r0 = 2.2e-10 / METER_BY_MEV):
 def primakoff_sigma_massive(ea, Z, ma, g):
     """
     Debopam corrections on axion mass
+    ea may be an array; zero below threshold
     """
-    if ea < ma: return 0
     alpha = 1/137
-    pa = sqrt(ea**2 - ma**2)
+    pa = sqrt(np.maximum(ea**2 - ma**2, 0.0))
     Egamma = ea
-    return (alpha*Z**2*g**2*pa*(-4*Egamma*pa-(2*Egamma**2-ma**2)*(np.log(np.abs((2*Egamma*(Egamma-pa)-ma**2)/(2*Egamma*(Egamma+pa)-ma**2))))))/(16*Egamma**3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xs = (alpha*Z**2*g**2*pa*(-4*Egamma*pa-(2*Egamma**2-ma**2)*(np.log(np.abs((2*Egamma*(Egamma-pa)-ma**2)/(2*Egamma*(Egamma+pa)-ma**2))))))/(16*Egamma**3)
+    return np.where(ea < ma, 0.0, xs)[()]
 
 
 
@@ -209,9 +212,13 @@ def brem_sigma_v2(Ee, g, ma, z=1):
 
 
 
-def brem_sigma_mc(Ee, g, ma, z=1, nsamples=100):
+def brem_sigma_mc(Ee, g, ma, z=1, nsamples=100, rng=None, method="mc"):
+    # method: "mc", or "sobol" / "halton" for scrambled quasi-random points (see sample_unit_cube)
     ea_max = Ee * (1 - power(ma/Ee, 2))
-    ea_rnd = np.random.uniform(ma, ea_max, nsamples)
+    if method == "mc":
+        ea_rnd = get_rng(rng).uniform(ma, ea_max, nsamples)
+    else:
+        ea_rnd = ma + (ea_max - ma) * sample_unit_cube(nsamples, 1, method, rng)[:,0]
     mc_vol = (Ee - ma)/nsamples
     return mc_vol * np.sum(brem_dsigma_dea(ea_rnd, Ee, g, ma, z))
 
@@ -0,0 +1,161 @@
+# Locations of the data files shipped with the package, and the binary cache of the numeric tables
+
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bump when the cached format changes; every cached table is then rebuilt from its text source
+BUNDLE_VERSION = 1
+
+# Directory holding the .npy bundle, overridden with the ALPLIB_CACHE_DIR environment variable
+BUNDLE_DIR = os.environ.get("ALPLIB_CACHE_DIR",
+                            os.path.join(os.path.expanduser("~"), ".cache", "alplib"))
+
+# Text tables compiled by build_bundle(): (directory relative to the package, genfromtxt options)
+BUNDLE_TABLES = [
+    ("data/photon_absorption", {"skip_header": 3}),
+    ("data/photon_pair_production", {"skip_header": 3}),
+    ("data/photon_compton", {"skip_header": 3}),
+    ("data/photon_coherent", {}),
+    ("data/solar", {"skip_header": 1}),
+    ("dark_arc/data", {}),
+]
+
+_tables = {}
+
+
+
+
+def resource_path(relative_path):
+    # Absolute path of a file given relative to the package directory, e.g. 'data/mat_params.json'
+    # Replaces pkg_resources.resource_filename, which is slow to import
+    return os.path.join(PACKAGE_DIR, relative_path)
+
+
+def bundle_dir():
+    return os.path.join(BUNDLE_DIR, "v{}".format(BUNDLE_VERSION))
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _bundle_paths(relative_path, options):
+    # Cached array and its manifest; the genfromtxt options are part of the name
+    tag = hashlib.sha256(json.dumps([relative_path, options], sort_keys=True).encode()).hexdigest()[:12]
+    stem = os.path.join(bundle_dir(), relative_path.replace('/', '_').replace(os.sep, '_') + '.' + tag)
+    return stem + '.npy', stem + '.json'
+
+
+def _write_manifest(manifest_path, manifest):
+    _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest).encode()))
+
+
+def _is_current(source, manifest_path):
+    # The size and mtime are checked first so the common case never rehashes the source;
+    # if they changed but the checksum did not (e.g. a fresh checkout), the manifest is refreshed
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get('version') != BUNDLE_VERSION:
+        return False
+    stat = os.stat(source)
+    if manifest.get('size') == stat.st_size and manifest.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    if manifest.get('sha256') != file_sha256(source):
+        return False
+    manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    _write_manifest(manifest_path, manifest)
+    return True
+
+
+def _atomic_write(path, write):
+    # Write to a temporary file next to path and rename it, so concurrent workers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def compile_table(relative_path, **options):
+    """
+    Parse a text table and write it to the binary bundle
+    :return: path of the .npy file
+    """
+    source = resource_path(relative_path)
+    npy_path, manifest_path = _bundle_paths(relative_path, options)
+    os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+    stat = os.stat(source)
+    data = np.genfromtxt(source, **options)
+    _atomic_write(npy_path, lambda f: np.save(f, data))
+    manifest = {'source': relative_path, 'options': options, 'version': BUNDLE_VERSION,
+                'sha256': file_sha256(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    _write_manifest(manifest_path, manifest)
+    return npy_path
+
+
+def load_table(relative_path, **options):
+    """
+    Numeric table of a package data file as a read-only array
+    The text file stays the source of truth: on first use it is parsed with np.genfromtxt(**options)
+    and stored in the bundle directory, after which it is memory-mapped, so the pages are shared by
+    every process reading it. A table whose source checksum changed is rebuilt; if the bundle
+    directory is not writable the text is parsed every time.
+    :param relative_path: path relative to the package, e.g. 'data/solar/periodic_earth_terms_R0.txt'
+    :param options: np.genfromtxt keyword arguments, e.g. skip_header=3
+    """
+    key = (relative_path, tuple(sorted(options.items())))
+    if key in _tables:
+        return _tables[key]
+
+    source = resource_path(relative_path)
+    npy_path, manifest_path = _bundle_paths(relative_path, options)
+    try:
+        if not (os.path.exists(npy_path) and _is_current(source, manifest_path)):
+            compile_table(relative_path, **options)
+        data = np.load(npy_path, mmap_mode='r')
+    except OSError:
+        data = np.genfromtxt(source, **options)
+        data.setflags(write=False)
+    _tables[key] = data
+    return data
+
+
+def build_bundle(verbose=False):
+    """
+    Compile every numeric table listed in BUNDLE_TABLES, e.g. once after installation
+    or before starting many worker processes: python -m alplib.resources
+    :return: list of the written .npy paths
+    """
+    written = []
+    for directory, options in BUNDLE_TABLES:
+        for name in sorted(os.listdir(resource_path(directory))):
+            if name.startswith('.') or not name.endswith('.txt'):
+                continue
+            relative_path = directory + '/' + name
+            written.append(compile_table(relative_path, **options))
+            if verbose:
+                print(relative_path, '->', written[-1])
+    return written
+
+
+
+
+if __name__ == "__main__":
+    build_bundle(verbose=True)
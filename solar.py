@@ -2,7 +2,7 @@
 # Based on "Solar Position Algorithm for Solar Radiation Applications"
 # by Ibrahim Reda and Afshin Andreas
 
-import pkg_resources
+from .resources import load_table
 
 import numpy as np
 from numpy import pi, power, sin, cos, tan, arccos, arctan, arctan2, arcsin, heaviside
@@ -17,37 +17,23 @@ class SPA:
         self.path_prefix = "data/solar/"
         self.file_extension = ".txt"
 
-        self.r0_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_R0" + self.file_extension), skip_header=1)
-        self.r1_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_R1" + self.file_extension), skip_header=1)
-        self.r2_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_R2" + self.file_extension), skip_header=1)
-        self.r3_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_R3" + self.file_extension), skip_header=1)
-        self.r4_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_R4" + self.file_extension), skip_header=1)
-
-        self.b0_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_B0" + self.file_extension), skip_header=1)
-        self.b1_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_B1" + self.file_extension), skip_header=1)
-
-        self.l0_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_L0" + self.file_extension), skip_header=1)
-        self.l1_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_L1" + self.file_extension), skip_header=1)
-        self.l2_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_L2" + self.file_extension), skip_header=1)
-        self.l3_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_L3" + self.file_extension), skip_header=1)
-        self.l4_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_L4" + self.file_extension), skip_header=1)
-        self.l5_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "periodic_earth_terms_L5" + self.file_extension), skip_header=1)
-
-        nuta_data = np.genfromtxt(pkg_resources.resource_filename(__name__, self.path_prefix \
-            + "nutation_longitude_obliquity" + self.file_extension), skip_header=1)
+        self.r0_data = load_table(self.path_prefix + "periodic_earth_terms_R0" + self.file_extension, skip_header=1)
+        self.r1_data = load_table(self.path_prefix + "periodic_earth_terms_R1" + self.file_extension, skip_header=1)
+        self.r2_data = load_table(self.path_prefix + "periodic_earth_terms_R2" + self.file_extension, skip_header=1)
+        self.r3_data = load_table(self.path_prefix + "periodic_earth_terms_R3" + self.file_extension, skip_header=1)
+        self.r4_data = load_table(self.path_prefix + "periodic_earth_terms_R4" + self.file_extension, skip_header=1)
+
+        self.b0_data = load_table(self.path_prefix + "periodic_earth_terms_B0" + self.file_extension, skip_header=1)
+        self.b1_data = load_table(self.path_prefix + "periodic_earth_terms_B1" + self.file_extension, skip_header=1)
+
+        self.l0_data = load_table(self.path_prefix + "periodic_earth_terms_L0" + self.file_extension, skip_header=1)
+        self.l1_data = load_table(self.path_prefix + "periodic_earth_terms_L1" + self.file_extension, skip_header=1)
+        self.l2_data = load_table(self.path_prefix + "periodic_earth_terms_L2" + self.file_extension, skip_header=1)
+        self.l3_data = load_table(self.path_prefix + "periodic_earth_terms_L3" + self.file_extension, skip_header=1)
+        self.l4_data = load_table(self.path_prefix + "periodic_earth_terms_L4" + self.file_extension, skip_header=1)
+        self.l5_data = load_table(self.path_prefix + "periodic_earth_terms_L5" + self.file_extension, skip_header=1)
+
+        nuta_data = load_table(self.path_prefix + "nutation_longitude_obliquity" + self.file_extension, skip_header=1)
         self.ai = nuta_data[:,5]
         self.bi = nuta_data[:,6]
         self.ci = nuta_data[:,7]
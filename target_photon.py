@@ -1,7 +1,36 @@
 import os
-import pkg_resources
+from .resources import resource_path, load_table
 import numpy as np
 from .materials import Material
+from .fmath import Interpolator1D
+
+
+# Coherent scattering tables, read once per process and shared read-only between instances
+_coherent_files = []
+_coherent_tables = {}
+
+
+def coherent_table(symbol, mass_number):
+    """
+    Return the shared [photon energy (MeV), cross section per nucleus (cm^2)] table of a material,
+    or None if there is no data file for it
+    """
+    if not _coherent_files:
+        folder_path = resource_path('data/photon_coherent')
+        _coherent_files.extend('.'.join(x.split('.')[:-1]) for x in os.listdir(folder_path)) # ['Th']
+    key = (symbol, mass_number)
+    if key not in _coherent_tables:
+        data = None
+        if symbol in _coherent_files:
+            # photon energy [MeV], cross section cm^2/g
+            data = load_table('data/photon_coherent/' + symbol + '.txt')
+            factor = 6e23 / mass_number
+            data = np.column_stack((data[:, 0], data[:, 1] / factor)) # 1/g -> 1/nucleus
+            data.setflags(write=False)
+        _coherent_tables[key] = data
+    return _coherent_tables[key]
+
+
 
 
 class PhotonCoherent:
@@ -11,20 +40,8 @@ class PhotonCoherent:
     def __init__(self, target: Material):
         self.material = target
         self.symbol = target.mat_name
-        self.data = None
-
-        folder_path = pkg_resources.resource_filename(__name__, 'data/photon_coherent')
-        files = os.listdir(folder_path) # ['Th.txt']
-        files = ['.'.join(x.split('.')[:-1]) for x in files] # ['Th']
-
-        if self.symbol in files:
-            # photon energy [MeV], cross section cm^2/g
-            fpath = os.path.join(folder_path, self.symbol + '.txt')
-            self.data = np.loadtxt(fpath)
-
-            mass_number = self.material.z[0] + self.material.n[0]
-            factor = 6e23 / mass_number
-            self.data[:, 1] /= factor # 1/g -> 1/nucleus
+        self.data = coherent_table(self.symbol, self.material.z[0] + self.material.n[0])
+        self.interp = Interpolator1D(self.data[:, 0], self.data[:, 1]) if self.data is not None else None
 
     def xsec(self, energy):
         """
@@ -32,5 +49,5 @@ class PhotonCoherent:
         return: cross section per nucleus [cm^2]
         """
         if self.data is not None:
-            return np.interp(energy, self.data[:, 0], self.data[:, 1])
+            return self.interp(energy)
         return None
\ No newline at end of file
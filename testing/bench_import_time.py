@@ -0,0 +1,51 @@
+# Import-time benchmark: `python -X importtime` for the package and each of its submodules
+# Usage: python bench_import_time.py [repeats]
+import os
+import sys
+import subprocess
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = os.path.basename(PACKAGE_DIR)
+HEAVY = ("scipy", "mpmath", "pkg_resources", "matplotlib")
+
+
+def submodules():
+    names = []
+    for f in sorted(os.listdir(PACKAGE_DIR)):
+        if f.endswith(".py") and f != "__init__.py":
+            names.append(PACKAGE_NAME + "." + f[:-3])
+    return names
+
+
+def import_time(module, repeats=3):
+    """
+    Best-of-repeats cumulative import time of module in a fresh interpreter
+    :return: (seconds, heavy dependencies loaded by the import), or (None, error) if the import fails
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(PACKAGE_DIR), os.environ.get("PYTHONPATH", "")]))
+    code = "import sys, {0}; print(','.join(m for m in {1} if m in sys.modules))".format(module, HEAVY)
+    best = None
+    heavy = ""
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        # importtime lines: "import time: self [us] | cumulative | imported package"
+        for line in out.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                t = int(fields[1]) * 1e-6
+                best = t if best is None else min(best, t)
+        heavy = out.stdout.strip()
+    return best, heavy
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print("{:<40s} {:>10s}   {}".format("module", "time [s]", "heavy deps loaded"))
+    for module in [PACKAGE_NAME] + submodules():
+        t, info = import_time(module, repeats)
+        if t is None:
+            print("{:<40s} {:>10s}   {}".format(module, "failed", info))
+        else:
+            print("{:<40s} {:>10.3f}   {}".format(module, t, info))
@@ -0,0 +1,42 @@
+# Broadcast (row x sample) simulate of the isotropic lepton/photon fluxes against the per-row simulate_single
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+
+# includes rows below every production threshold
+ROWS = np.column_stack([np.logspace(-1, 2, 25), np.logspace(8, 10, 25)])
+
+
+def check_block(cls, input_name, block_size, masses=(0.01, 0.5, 5.0)):
+    # both paths draw the same uniform variates in the same order from equally seeded generators
+    for ma in masses:
+        block = cls(**{input_name: ROWS}, axion_mass=ma, nsamples=40, seed=11)
+        block.simulate(block_size=block_size)
+        single = cls(**{input_name: ROWS}, axion_mass=ma, nsamples=40, seed=11)
+        single.events.clear()
+        for row in ROWS:
+            single.simulate_single(row)
+
+        assert len(block.events.energy) == len(single.events.energy) > 0
+        np.testing.assert_allclose(block.events.energy, single.events.energy, rtol=1e-12)
+        np.testing.assert_allclose(block.events.flux, single.events.flux, rtol=1e-10, atol=0)
+        assert np.all(np.isfinite(block.events.flux))
+        np.testing.assert_array_equal(block.events.mass, ma)
+
+
+def test_compton_block():
+    check_block(fluxes.FluxComptonIsotropic, "photon_flux", 7)
+
+
+def test_brem_block():
+    check_block(fluxes.FluxBremIsotropic, "electron_flux", 1000)
+
+
+def test_pair_annihilation_block():
+    check_block(fluxes.FluxPairAnnihilationIsotropic, "positron_flux", 4, masses=(0.01, 0.5))
@@ -0,0 +1,104 @@
+# Fraction-weighted compound-material cross sections against a loop over the single isotopes
+import os
+import sys
+import copy
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+generators = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".generators")
+materials = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".materials")
+
+COMPOUNDS = ("CsI", "NaI", "H2O")
+
+rng = np.random.default_rng(3)
+PHOTONS = np.column_stack([np.sort(10 ** rng.uniform(0, 2, 40)), rng.uniform(1e8, 1e10, 40)])
+
+
+def isotope_loop(flux, run):
+    # frac-weighted sum of the event weights of single-isotope copies of flux, drawn with the same seed
+    total = 0.0
+    for z, frac in zip(flux.target_zs, flux.target_frac):
+        single = copy.deepcopy(flux)
+        single.target_zs = np.array([z])
+        single.target_frac = np.array([1.0])
+        total = total + frac * run(single)
+    return total
+
+
+def check_flux(make, run):
+    for name in COMPOUNDS:
+        flux = make(materials.get_material(name))
+        looped = isotope_loop(copy.deepcopy(flux), run)
+        compound = run(flux)
+        assert np.any(compound > 0)
+        np.testing.assert_allclose(compound, looped, rtol=1e-12)
+
+
+def simulated_weights(flux):
+    flux.simulate()
+    return np.array(flux.events.flux)
+
+
+def test_primakoff_compound_flux():
+    check_flux(lambda t: fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, target=t, axion_mass=0.5), simulated_weights)
+    check_flux(lambda t: fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, target=t, axion_mass=0.5),
+               lambda f: np.array(f.simulate_masses([0.1, 1.0, 5.0]).flux))
+
+
+def test_compton_brem_pair_compound_flux():
+    for sampling in ("uniform", "importance"):
+        check_flux(lambda t: fluxes.FluxComptonIsotropic(photon_flux=PHOTONS, target=t, axion_mass=0.5, seed=4,
+                                                         sampling=sampling), simulated_weights)
+    check_flux(lambda t: fluxes.FluxBremIsotropic(electron_flux=PHOTONS, target=t, axion_mass=0.5, seed=4),
+               simulated_weights)
+    check_flux(lambda t: fluxes.FluxPairAnnihilationIsotropic(positron_flux=PHOTONS, target=t, axion_mass=0.5,
+                                                              seed=4), simulated_weights)
+
+
+def test_compound_mean_numbers():
+    for name in COMPOUNDS:
+        mat = materials.get_material(name)
+        flux = fluxes.FluxBremIsotropic(electron_flux=PHOTONS, target=mat, axion_mass=0.5)
+        frac = np.array(mat.frac) / np.sum(mat.frac)
+        np.testing.assert_allclose(flux.target_z, np.sum(frac * mat.z), rtol=1e-12)
+        np.testing.assert_allclose(flux.ntarget_area_density, 6.76 * 6.022e23 / (2 * np.sum(frac * mat.z)),
+                                   rtol=1e-3)
+
+
+def test_inverse_primakoff_compound_detector():
+    flux = fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_mass=0.5)
+    flux.simulate()
+    flux.propagate()
+    for name in COMPOUNDS:
+        mat = materials.get_material(name)
+        frac = np.array(mat.frac) / np.sum(mat.frac)
+        events = fluxes.PhotonEventGenerator(flux, mat)
+        counts = events.inverse_primakoff(1e-3, 0.5, 1e25, 100, 0.0)
+        expected = 0.0
+        for z, f in zip(mat.z, frac):
+            single = fluxes.PhotonEventGenerator(flux, mat)
+            single.det_zs, single.det_frac = np.array([z], dtype=float), np.array([1.0])
+            expected += f * single.inverse_primakoff(1e-3, 0.5, 1e25, 100, 0.0)
+        assert counts > 0
+        np.testing.assert_allclose(counts, expected, rtol=1e-12)
+
+
+def test_isotropic_primakoff_scatter_compound_detector():
+    gen = generators.IsotropicAxionFromPrimakoff(photon_rates=PHOTONS, axion_mass=0.5, axion_coupling=1e-5,
+                                                 target=materials.get_material("Th"))
+    gen.simulate()
+    for name in COMPOUNDS:
+        mat = materials.get_material(name)
+        frac = np.array(mat.frac) / np.sum(mat.frac)
+        counts = copy.deepcopy(gen).scatter_events(1e25, mat, 100, 0.0)
+        expected = sum(f * copy.deepcopy(gen).scatter_events(1e25, [z], 100, 0.0) for z, f in zip(mat.z, frac))
+        assert counts > 0
+        np.testing.assert_allclose(counts, expected, rtol=1e-12)
+        # a list of z sums the nuclei of one molecule
+        np.testing.assert_allclose(copy.deepcopy(gen).scatter_events(1e25, list(mat.z), 100, 0.0),
+                                   sum(copy.deepcopy(gen).scatter_events(1e25, [z], 100, 0.0) for z in mat.z),
+                                   rtol=1e-12)
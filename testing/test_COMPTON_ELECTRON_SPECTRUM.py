@@ -0,0 +1,90 @@
+# IsotropicAxionFromCompton.electron_events_binned against a direct loop over axion energies and recoil bins
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+generators = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".generators")
+det_xs = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".det_xs")
+constants = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".constants")
+
+
+def loop_electron_events(gen, nbins, detector_number, detector_z, detection_time, threshold):
+    exposure = constants.METER_BY_MEV ** 2 * detection_time * detector_number * detector_z
+    energies, weights = [], []
+    for i, ea in enumerate(gen.axion_energy):
+        et_min, et_max = det_xs.icompton_recoil_range(ea, gen.axion_mass)
+        delta_et = (et_max - et_min) / (nbins - 1)
+        et = [et_min + (j + 0.5) * delta_et for j in range(nbins - 1)]
+        dsigma = [det_xs.icompton_dsigma_det(ea, e, gen.axion_coupling, gen.axion_mass) for e in et]
+        sigma = sum(dsigma) * delta_et
+        for j in range(nbins - 1):
+            if et[j] >= threshold:
+                energies.append(et[j])
+                weights.append(gen.scatter_weight[i] * dsigma[j] / sigma * gen.axion_scatter_cross[i]
+                               * delta_et * exposure)
+    return np.array(energies), np.array(weights)
+
+
+def test_massive_axion_recoil_spectrum_matches_loop():
+    photons = np.column_stack([np.logspace(0.2, 1.8, 8), np.full(8, 1e12)])
+    for ma in (0.05, 1.0, 5.0):
+        gen = generators.IsotropicAxionFromCompton(photon_rates=photons, axion_mass=ma, axion_coupling=1e-6,
+                                                   detector_distance=20., detector_length=5.)
+        gen.simulate()
+        electrons, photons_out = gen.electron_events_binned(12, 1e28, 18, 3e7, 0.1)
+        energies, weights = loop_electron_events(gen, 12, 1e28, 18, 3e7, 0.1)
+
+        assert electrons > 0
+        assert electrons == photons_out
+        assert np.all(gen.electron_weight >= 0)
+        np.testing.assert_allclose(gen.electron_energy, energies, rtol=1e-12)
+        np.testing.assert_allclose(gen.electron_weight, weights, rtol=1e-10)
+        np.testing.assert_allclose(electrons, np.sum(weights), rtol=1e-10)
+
+
+def test_recoil_spectrum_within_kinematic_range():
+    for ma in (0.0, 0.05, 1.0, 5.0):
+        ea = np.linspace(ma + 0.1, 20.0, 50)[:, np.newaxis]
+        et_min, et_max = det_xs.icompton_recoil_range(ea, ma)
+        et = et_min + (et_max - et_min) * np.linspace(0.0, 1.0, 40)
+        assert np.all(det_xs.icompton_dsigma_det(ea, et, 1e-6, ma) >= 0)
+        assert np.all(det_xs.icompton_dsigma_det(ea, et_max * 1.01, 1e-6, ma) == 0)
+    # massless Compton edge
+    np.testing.assert_allclose(det_xs.icompton_recoil_range(5.0, 0.0)[1],
+                               2 * 5.0 ** 2 / (constants.M_E + 2 * 5.0), rtol=1e-12)
+
+
+def test_histogram_reduction_matches_flat_arrays():
+    photons = np.column_stack([np.logspace(0.2, 1.8, 8), np.full(8, 1e12)])
+    edges = np.linspace(0.0, 60.0, 31)
+    gen = generators.IsotropicAxionFromCompton(photon_rates=photons, axion_mass=1.0, axion_coupling=1e-6,
+                                               detector_distance=20., detector_length=5.)
+    gen.simulate()
+    totals = gen.electron_events_binned(12, 1e28, 18, 3e7, 0.1, electron_edges=edges)
+    electrons, photons_out = gen.electron_histogram, gen.photon_histogram
+    flat = gen.electron_events_binned(12, 1e28, 18, 3e7, 0.1)
+    expected_e, expected_p = gen.recoil_histograms(edges)
+
+    np.testing.assert_allclose(totals, flat, rtol=1e-12)
+    np.testing.assert_allclose(electrons.sumw, expected_e.sumw, rtol=1e-12, atol=0)
+    np.testing.assert_allclose(electrons.sumw2, expected_e.sumw2, rtol=1e-12, atol=0)
+    np.testing.assert_allclose(photons_out.sumw, expected_p.sumw, rtol=1e-12, atol=0)
+
+
+def test_total_xs_against_recoil_spectrum_integral():
+    # pins the known disagreement of the total xs with the integral of icompton_dsigma_det near threshold
+    def integral(ea, ma):
+        et_min, et_max = det_xs.icompton_recoil_range(ea, ma)
+        et = np.linspace(et_min, et_max, 200001)
+        dsigma = det_xs.icompton_dsigma_det(ea, et, 1e-6, ma)
+        return np.sum((dsigma[1:] + dsigma[:-1]) / 2) * (et[1] - et[0])
+
+    for ma, ea, borexino, massless in ((1.0, 1.5, 1.30, 2.08), (5.0, 5.5, 1.95, 11.9)):
+        np.testing.assert_allclose(integral(ea, ma) / det_xs.icompton_sigma(ea, ma, 1e-6), borexino, rtol=1e-2)
+        np.testing.assert_allclose(integral(ea, ma) / det_xs.icompton_sigma_old(ea, 1e-6), massless, rtol=1e-2)
+    for ma, ea in ((0.0, 1.5), (1.0, 10.0), (5.0, 50.0)):
+        np.testing.assert_allclose(det_xs.icompton_sigma(ea, ma, 1e-6), integral(ea, ma), rtol=0.04)
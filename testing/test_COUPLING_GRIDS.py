@@ -0,0 +1,72 @@
+# *_grid event counts of the event generators against their per-coupling, per-mass methods
+import os
+import sys
+import copy
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+materials = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".materials")
+
+COUPLINGS = np.logspace(-7, -3, 5)
+MASSES = np.array([0.01, 0.5, 5.0])
+PHOTONS = np.column_stack([np.logspace(-0.5, 2, 40), np.full(40, 1e12)])
+DETECTOR = materials.get_material("Ar")
+ARGS = (1e28, 100, 0.5)  # ntargets, days of exposure, threshold
+
+
+def looped_counts(make_flux, count):
+    # counts[i, j]: a fresh flux at MASSES[j], propagated and detected at COUPLINGS[i]
+    counts = np.zeros((len(COUPLINGS), len(MASSES)))
+    for j, ma in enumerate(MASSES):
+        flux = make_flux(ma)
+        for i, g in enumerate(COUPLINGS):
+            single = copy.deepcopy(flux)
+            single.propagate(new_coupling=g)
+            counts[i, j] = count(single, g, ma)
+    return counts
+
+
+def test_photon_grids():
+    def make(ma):
+        flux = fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_mass=ma, axion_coupling=1e-5)
+        flux.simulate()
+        return flux
+
+    batch = fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_coupling=1e-5)
+    batch.simulate_masses(MASSES)
+    det = fluxes.PhotonEventGenerator(batch, DETECTOR)
+
+    masses, counts = det.inverse_primakoff_grid(COUPLINGS, *ARGS)
+    np.testing.assert_array_equal(masses, MASSES)
+    expected = looped_counts(make, lambda f, g, ma: fluxes.PhotonEventGenerator(f, DETECTOR)
+                             .inverse_primakoff(g, ma, *ARGS))
+    assert np.all(expected[:, :2] > 0)
+    np.testing.assert_allclose(counts, expected, rtol=1e-10, atol=0)
+
+    masses, counts = det.decays_grid(COUPLINGS, 100, 0.5)
+    expected = looped_counts(make, lambda f, g, ma: fluxes.PhotonEventGenerator(f, DETECTOR).decays(100, 0.5))
+    np.testing.assert_allclose(counts, expected, rtol=1e-10, atol=0)
+
+
+def test_electron_grids():
+    def make(ma):
+        flux = fluxes.FluxComptonIsotropic(photon_flux=PHOTONS, axion_mass=ma, axion_coupling=1e-6, seed=5)
+        flux.simulate()
+        return flux
+
+    for ma in MASSES:
+        flux = make(ma)
+        det = fluxes.ElectronEventGenerator(flux, DETECTOR)
+        for grid, single in ((det.compton_grid, lambda e, g: e.compton(g, ma, *ARGS)),
+                             (det.pair_production_grid, lambda e, g: e.pair_production(g, ma, *ARGS))):
+            masses, counts = grid(COUPLINGS, *ARGS)
+            np.testing.assert_array_equal(masses, [ma])
+            for i, g in enumerate(COUPLINGS):
+                f = copy.deepcopy(flux)
+                f.propagate(new_coupling=g)
+                np.testing.assert_allclose(counts[i, 0], single(fluxes.ElectronEventGenerator(f, DETECTOR), g),
+                                           rtol=1e-10, atol=0)
@@ -0,0 +1,83 @@
+# *_events_scan against fresh-copy calls of the in-place event methods, and their statelessness
+import os
+import sys
+import copy
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+generators = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".generators")
+materials = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".materials")
+
+THRESHOLDS = np.array([0.0, 0.5, 2.0, 5.0, 50.0])
+TIMES = np.array([1.0, 3.0])
+
+rng = np.random.default_rng(5)
+N = 300
+PHOTONS = np.column_stack([10**rng.uniform(-1, 1.3, N), 10**rng.uniform(-6, -1, N), rng.uniform(1e10, 1e12, N)])
+
+
+def weights_of(gen):
+    return {k: np.array(v, dtype=np.float64) for k, v in vars(gen).items() if k.endswith('weight')}
+
+
+def check_scan(gen, scan, events):
+    # scan(thresholds, times) against events(gen_copy, time, threshold) for every pair
+    before = weights_of(gen)
+    counts = scan(THRESHOLDS, TIMES)
+    assert counts.shape == (len(THRESHOLDS), len(TIMES))
+    for i, threshold in enumerate(THRESHOLDS):
+        for j, time in enumerate(TIMES):
+            np.testing.assert_allclose(counts[i, j], events(copy.deepcopy(gen), time, threshold), rtol=1e-10)
+    after = weights_of(gen)
+    for k in before:
+        np.testing.assert_array_equal(before[k], after[k])
+    assert np.any(counts > 0)
+
+
+def test_compton_beam_scans():
+    gen = generators.ComptonAxionFromBeam(photon_rates=PHOTONS, axion_mass=1.5, axion_coupling=1e-6,
+                                          detector_distance=20., detector_length=5., detector_area=10., seed=1)
+    gen.simulate()
+    gen.propagate()
+    check_scan(gen, lambda th, t: gen.decay_events_scan(th, 10., t),
+               lambda g, t, th: g.decay_events(10., t, th))
+    check_scan(gen, lambda th, t: gen.scatter_events_scan(th, 1e20, 18, t),
+               lambda g, t, th: g.scatter_events(1e20, 18, t, th))
+
+
+def test_isotropic_compton_scans():
+    gen = generators.IsotropicAxionFromCompton(photon_rates=PHOTONS[:, [0, 2]], axion_mass=1.5, axion_coupling=1e-6,
+                                               detector_distance=20., detector_length=5.)
+    gen.simulate()
+    check_scan(gen, lambda th, t: gen.decay_events_scan(th, 10., t),
+               lambda g, t, th: g.decay_events(10., t, th))
+    check_scan(gen, lambda th, t: gen.scatter_events_scan(th, 1e20, 18, t),
+               lambda g, t, th: g.scatter_events(1e20, 18, t, th))
+
+
+def test_isotropic_primakoff_scans():
+    gen = generators.IsotropicAxionFromPrimakoff(photon_rates=PHOTONS[:, [0, 2]], axion_mass=0.5, axion_coupling=1e-5,
+                                                 gaee=1e-6, target=materials.get_material("Th"),
+                                                 detector_distance=20., detector_length=5., detector_area=10.)
+    gen.simulate()
+    levels = [np.column_stack([rng.uniform(0.5, 10, 50), rng.uniform(0, 1, 50)])]
+    check_scan(gen, lambda th, t: gen.decay_events_scan(th, t),
+               lambda g, t, th: g.decay_events(t, th))
+    check_scan(gen, lambda th, t: gen.scatter_events_scan(th, 1e20, [32, 18], t),
+               lambda g, t, th: g.scatter_events(1e20, [32, 18], t, th))
+    check_scan(gen, lambda th, t: gen.absorption_events_scan(th, 1e20, t, levels, [0.5]),
+               lambda g, t, th: g.absorption_events(1e20, t, th, levels, [0.5]))
+
+
+def test_primakoff_beam_scans():
+    gen = generators.PrimakoffAxionFromBeam(photon_rates=PHOTONS, axion_mass=0.5, axion_coupling=1e-5,
+                                            detector_distance=20., detector_length=5., detector_area=10., seed=1)
+    gen.simulate()
+    gen.propagate()
+    check_scan(gen, lambda th, t: gen.decay_events_scan(th, t),
+               lambda g, t, th: g.decay_events(t, th))
+    check_scan(gen, lambda th, t: gen.scatter_events_scan(th, 1e20, 18, t),
+               lambda g, t, th: g.scatter_events(1e20, 18, t, th))
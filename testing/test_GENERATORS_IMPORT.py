@@ -0,0 +1,59 @@
+# Import-time regression test: importing the generators must not load the multipole backend
+import os
+import sys
+import subprocess
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = os.path.basename(PACKAGE_DIR)
+
+CHECK = """
+import sys, time
+t0 = time.perf_counter()
+import {0}.generators
+dt = time.perf_counter() - t0
+assert 'kshell_multipole' not in sys.modules, 'kshell_multipole imported at module load'
+print(dt)
+""".format(PACKAGE_NAME)
+
+
+STUB_BACKEND = """
+import sys
+import numpy as np
+from {0}.generators import IsotropicAxionFromPrimakoff
+from {0}.materials import get_material
+
+class StubMultipole:
+    def get(self, ea, ma, gann, interaction=None):
+        return gann**2
+
+gen = IsotropicAxionFromPrimakoff(photon_rates=np.array([[2.0, 1e10], [5.0, 1e10]]), axion_mass=0.1,
+                                 target=get_material("Th"))
+gen.simulate()
+gen.absorption_events_multipole(1e20, 1.0, 0.0, StubMultipole(), "GT")
+assert 'kshell_multipole' not in sys.modules, 'kshell_multipole imported by absorption_events_multipole'
+""".format(PACKAGE_NAME)
+
+
+def run_fresh(code):
+    # Run in a fresh interpreter so that nothing is already cached in sys.modules
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(PACKAGE_DIR), os.environ.get("PYTHONPATH", "")]))
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    return out.stdout
+
+
+def generators_import_time():
+    return float(run_fresh(CHECK).split()[-1])
+
+
+def test_generators_import_without_multipole_backend():
+    generators_import_time()
+
+
+def test_multipole_absorption_with_own_backend():
+    # A backend object passed by the caller must not pull in the default backend package
+    run_fresh(STUB_BACKEND)
+
+
+if __name__ == "__main__":
+    print("import {}.generators: {:.3f} s".format(PACKAGE_NAME, generators_import_time()))
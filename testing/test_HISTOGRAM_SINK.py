@@ -0,0 +1,66 @@
+# HistogramSink against np.histogram / np.histogram2d, and shared_reduce with several workers against serial
+import os
+import sys
+import copy
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+events = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".events")
+parallel = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".parallel")
+generators = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".generators")
+
+rng = np.random.default_rng(8)
+# weights of similar size, so np.histogram's cumulative sums stay accurate
+X = np.concatenate([10 ** rng.uniform(-2.2, 2.2, 5000), np.logspace(-2, 2, 9)])  # includes edges and outliers
+Y = rng.uniform(-0.1, 1.1, X.size)
+W = rng.uniform(0.5, 2.0, X.size)
+
+EDGES = {
+    "linear": np.linspace(0.0, 100.0, 41),
+    "log": np.logspace(-2, 2, 33),
+    "irregular": np.array([0.01, 0.03, 0.2, 1.0, 1.5, 7.0, 40.0, 100.0]),
+}
+
+
+def test_1d_matches_np_histogram():
+    for spacing, edges in EDGES.items():
+        sink = events.HistogramSink(edges)
+        assert sink._spacing[0] == (spacing if spacing != "irregular" else None)
+        # filled in two parts, as the chunks of a stream would be
+        sink.fill(W[:2000], X[:2000])
+        sink.fill(W[2000:], X[2000:])
+        np.testing.assert_allclose(sink.sumw, np.histogram(X, edges, weights=W)[0], rtol=1e-10)
+        np.testing.assert_allclose(sink.sumw2, np.histogram(X, edges, weights=W ** 2)[0], rtol=1e-10)
+        np.testing.assert_allclose(sink.errors(), np.sqrt(sink.sumw2), rtol=1e-12)
+
+
+def test_2d_matches_np_histogram2d_and_merges(tmp_path):
+    edges = (EDGES["log"], np.linspace(0.0, 1.0, 11))
+    parts = [events.HistogramSink(*edges) for _ in range(3)]
+    for part, idx in zip(parts, np.array_split(np.arange(X.size), 3)):
+        part.fill(W[idx], X[idx], Y[idx])
+    parts[1].save(str(tmp_path / "part1.npz"))
+    merged = events.merge_histograms([parts[0], str(tmp_path / "part1.npz"), parts[2]])
+    np.testing.assert_allclose(merged.sumw, np.histogram2d(X, Y, edges, weights=W)[0], rtol=1e-10)
+    np.testing.assert_allclose(merged.sumw2, np.histogram2d(X, Y, edges, weights=W ** 2)[0], rtol=1e-10)
+
+
+def test_shared_reduce_matches_serial():
+    photons = np.column_stack([np.linspace(1.0, 20.0, 30), np.linspace(1e-4, 1e-2, 30), np.full(30, 1e10)])
+    gen = generators.PrimakoffAxionFromBeam(photon_rates=photons, axion_mass=0.5, axion_coupling=1e-5,
+                                            nsamples=200, seed=6)
+    sink = gen.kinematics_sink()
+    for nworkers in (1, 3):
+        parallel_sink = copy.deepcopy(gen).simulate_kinematics(sink=gen.kinematics_sink(), nworkers=nworkers)
+        # the same ranges and per-range streams, reduced in this process
+        serial = gen.kinematics_sink()
+        for start, stop, seed_seq in parallel._ranges(len(photons), nworkers, None, gen.seed):
+            worker = copy.deepcopy(gen)
+            worker.rng = np.random.default_rng(seed_seq)
+            serial += worker.simulate_kinematics_chunk(photons[start:stop], sink.edges)
+        assert np.sum(serial.sumw) > 0
+        np.testing.assert_allclose(parallel_sink.sumw, serial.sumw, rtol=1e-12, atol=0)
+        np.testing.assert_allclose(parallel_sink.sumw2, serial.sumw2, rtol=1e-12, atol=0)
@@ -0,0 +1,40 @@
+# Importance-sampled flux integrals against uniform sampling, and the LRU of inverse CDF tables
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+
+PHOTONS = np.column_stack([np.logspace(0, 2, 30), np.full(30, 1e10)])
+
+
+def total_flux(cls, sampling, nsamples, seed):
+    flux = cls(PHOTONS, axion_mass=0.5, nsamples=nsamples, seed=seed, sampling=sampling)
+    flux.simulate()
+    return np.sum(flux.events.flux)
+
+
+def test_importance_sampling_matches_uniform():
+    for cls in (fluxes.FluxComptonIsotropic, fluxes.FluxBremIsotropic, fluxes.FluxPairAnnihilationIsotropic):
+        uniform = total_flux(cls, "uniform", 20000, 1)
+        importance = total_flux(cls, "importance", 20000, 2)
+        np.testing.assert_allclose(importance, uniform, rtol=2e-2)
+
+
+def test_cdf_tables_least_recently_used():
+    flux = fluxes.FluxComptonIsotropic(PHOTONS, axion_mass=0.5, nsamples=10, seed=1, sampling="importance")
+    flux.simulate_block(PHOTONS[:1])
+    kept = next(iter(flux._cdf_tables.values()))
+    for k in range(1, 100):
+        flux.simulate_block(PHOTONS[:1] * [1 + k / 100, 1])
+        if k == 1:
+            evicted = next(reversed(flux._cdf_tables.values()))
+        flux.simulate_block(PHOTONS[:1])  # the first table stays in use
+    tables = list(flux._cdf_tables.values())
+    assert len(tables) == 64
+    assert any(t is kept for t in tables)
+    assert not any(t is evicted for t in tables)
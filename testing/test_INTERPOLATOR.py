@@ -0,0 +1,49 @@
+# Interpolator1D and InterpolatorStack against np.interp on the (log) grids
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fmath = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fmath")
+
+rng = np.random.default_rng(21)
+GRIDS = {
+    "uniform": np.linspace(0.01, 10.0, 200),
+    "log_uniform": np.logspace(-2, 1, 200),
+    "irregular": np.sort(10 ** rng.uniform(-2, 1, 200)),
+}
+Y = 10 ** rng.uniform(-3, 3, 200)
+
+
+def reference(x, xs, ys, log_x, log_y):
+    fx = np.log10 if log_x else (lambda v: v)
+    fy = np.log10 if log_y else (lambda v: v)
+    res = np.interp(fx(x), fx(xs), fy(ys))
+    return 10 ** res if log_y else res
+
+
+def test_matches_np_interp():
+    for name, xs in GRIDS.items():
+        # grid points, points inside, outside on both sides; small and large (arithmetic) batches
+        points = np.concatenate([xs, 10 ** rng.uniform(-2.5, 1.5, 2000)])
+        for log_x in (False, True):
+            for log_y in (False, True):
+                f = fmath.Interpolator1D(xs, Y, log_x=log_x, log_y=log_y)
+                np.testing.assert_allclose(f(points), reference(points, xs, Y, log_x, log_y), rtol=1e-10)
+                for x in points[::500]:
+                    np.testing.assert_allclose(f(x), reference(x, xs, Y, log_x, log_y), rtol=1e-10)
+                    assert np.ndim(f(x)) == 0
+                np.testing.assert_allclose(f.scaled(3.0)(points), 3.0 * f(points), rtol=1e-10)
+
+
+def test_stack_matches_single_tables():
+    tables = [fmath.Interpolator1D(xs, Y * (k + 1), log_x=True, log_y=True) for k, xs in enumerate(GRIDS.values())]
+    stack = fmath.InterpolatorStack(tables)
+    points = 10 ** rng.uniform(-2.5, 1.5, (7, 30))
+    res = stack(points)
+    assert res.shape == (len(tables),) + points.shape
+    for k, f in enumerate(tables):
+        np.testing.assert_allclose(res[k], f(points), rtol=1e-10)
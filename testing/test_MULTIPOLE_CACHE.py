@@ -0,0 +1,83 @@
+# CachedMultipoleXsec: analytic gann^2 scaling, JSON round trip and rewrites of the cache file
+import os
+import sys
+import json
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+multipole = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".multipole")
+
+
+class CountingBackend:
+    # stand-in backend with a gann^2 cross section that counts its evaluations
+    def __init__(self, nucleus=None):
+        self.nucleus = nucleus
+        self.calls = 0
+
+    def get(self, ea, ma, gann, interaction="GT"):
+        self.calls += 1
+        scale = 2.0 if interaction == "M1" else 1.0
+        return scale * gann ** 2 * np.exp(-ea) * (1 + ma)
+
+
+def test_gann_scaling_evaluates_backend_once():
+    backend = CountingBackend()
+    cached = multipole.CachedMultipoleXsec(backend, nucleus="Fe57")
+    for gann in np.logspace(-8, -3, 6):
+        for interaction in ("GT", "M1"):
+            np.testing.assert_allclose(cached.get(1.5, 0.1, gann, interaction),
+                                       CountingBackend().get(1.5, 0.1, gann, interaction), rtol=1e-12)
+    assert backend.calls == 2
+    assert (cached.hits, cached.misses) == (10, 2)
+
+
+def test_json_round_trip(tmp_path):
+    path = str(tmp_path / "multipole.json")
+    cached = multipole.CachedMultipoleXsec(CountingBackend(), nucleus="Fe57", cache_file=path)
+    energies = np.linspace(0.5, 5.0, 7)
+    expected = [cached.get(ea, 0.1, 1e-4, "GT") for ea in energies]
+    cached.save()
+    # entries of another nucleus in the same file are kept and not loaded for this one
+    other = multipole.CachedMultipoleXsec(CountingBackend(), nucleus="Kr83", cache_file=path)
+    other.get(1.0, 0.1, 1e-4)
+    other.save()
+
+    backend = CountingBackend()
+    reloaded = multipole.CachedMultipoleXsec(backend, nucleus="Fe57", cache_file=path)
+    assert len(reloaded) == len(energies)
+    np.testing.assert_allclose([reloaded.get(ea, 0.1, 1e-4, "GT") for ea in energies], expected, rtol=1e-12)
+    assert backend.calls == 0
+    with open(path) as f:
+        assert sorted({row[0] for row in json.load(f)}) == ["Fe57", "Kr83"]
+
+
+def test_cache_file_rewritten_only_for_new_entries(tmp_path):
+    path = str(tmp_path / "multipole.json")
+    cached = multipole.CachedMultipoleXsec(CountingBackend(), nucleus="Fe57", cache_file=path)
+    cached.get(1.0, 0.1, 1e-4)
+    cached.save()
+    stamp = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(stamp - 10**9, stamp - 10**9))
+
+    cached.get(1.0, 0.1, 3e-4)
+    cached.save()
+    assert os.stat(path).st_mtime_ns == stamp - 10**9
+
+    cached.get(2.0, 0.1, 1e-4)
+    cached.save()
+    assert os.stat(path).st_mtime_ns != stamp - 10**9
+    with open(path) as f:
+        assert len(json.load(f)) == 2
+    assert [p for p in os.listdir(str(tmp_path)) if p.endswith(".tmp")] == []
+
+
+def test_persistence_needs_nucleus(tmp_path):
+    try:
+        multipole.CachedMultipoleXsec(CountingBackend(), cache_file=str(tmp_path / "multipole.json"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError without a nucleus label")
@@ -0,0 +1,62 @@
+# abs_nu_xsec_GT_vec against the scalar abs_nu_xsec_GT looped over axion energies and nuclei
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+det_xs = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".det_xs")
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+materials = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".materials")
+
+rng = np.random.default_rng(12)
+# unsorted levels, with a repeated energy and a level close to another
+LEVELS = [np.column_stack([rng.uniform(0.5, 3.0, 80), rng.uniform(0.0, 1.0, 80)]),
+          np.array([[1.2, 0.3], [0.9, 0.1], [1.2, 0.2], [2.004, 0.5], [2.0, 0.4]])]
+JIS = [0.5, 1.5]
+MA = 0.8
+ENERGIES = np.concatenate([rng.uniform(0.3, 3.2, 300), [0.8, 0.85, 1.2, 2.0, 2.004, 2.011]])
+
+
+def scalar_loop(energies, g):
+    xsec = np.zeros(len(energies))
+    photons = []
+    for i, ea in enumerate(energies):
+        for nucl_ex, Ji in zip(LEVELS, JIS):
+            photo_energies, xs = det_xs.abs_nu_xsec_GT(ea, MA, g, nucl_ex, Ji)
+            xsec[i] += xs
+            if photo_energies is not None:
+                photons.extend((i, e) for e in photo_energies)
+    return xsec, photons
+
+
+def test_vectorized_matches_scalar_loop():
+    xsec, photon_energy, photon_index = det_xs.abs_nu_xsec_GT_vec(ENERGIES, MA, 1e-4, LEVELS, JIS)
+    expected, photons = scalar_loop(ENERGIES, 1e-4)
+    assert np.count_nonzero(expected) > 10
+    np.testing.assert_allclose(xsec, expected, rtol=1e-10, atol=0)
+    assert np.all(np.diff(photon_index) >= 0)
+    assert sorted(zip(photon_index, photon_energy)) == sorted(photons)
+
+    # prebuilt level tables give the same result
+    tables = [det_xs.NuclearLevelTable(lv, Ji) for lv, Ji in zip(LEVELS, JIS)]
+    np.testing.assert_array_equal(det_xs.abs_nu_xsec_GT_vec(ENERGIES, MA, 1e-4, tables)[0], xsec)
+
+
+def test_photon_event_generator_absorption():
+    photons = np.column_stack([ENERGIES, np.full(len(ENERGIES), 1e10)])
+    flux = fluxes.FluxPrimakoffIsotropic(photon_flux=photons, axion_mass=MA, axion_coupling=1e-5)
+    flux.simulate()
+    flux.propagate()
+    det = fluxes.PhotonEventGenerator(flux, materials.get_material("Ar"))
+    counts = det.nucleus_absorption(1e-4, MA, 1e25, 100, 1.0, LEVELS, JIS)
+
+    energy = np.asarray(flux.axion_energy)
+    expected, _ = scalar_loop(energy, 1e-4)
+    expected *= 100 * fluxes.S_PER_DAY * (1e25 / flux.det_area) * fluxes.METER_BY_MEV ** 2 \
+        * flux.scatter_axion_weight * (energy >= 1.0)
+    assert counts > 0
+    np.testing.assert_allclose(det.absorption_weights, expected, rtol=1e-10, atol=0)
+    np.testing.assert_allclose(counts, np.sum(expected), rtol=1e-10)
@@ -0,0 +1,43 @@
+# AxionFlux.propagate_couplings against propagate(new_coupling) on fresh copies, one coupling at a time
+import os
+import sys
+import copy
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+
+COUPLINGS = np.logspace(-7, -3, 9)
+PHOTONS = np.column_stack([np.logspace(-0.5, 2, 50), np.full(50, 1e10)])
+
+
+def check_couplings(flux):
+    decay, scatter = flux.propagate_couplings(COUPLINGS)
+    decay_totals, scatter_totals = flux.propagate_couplings(COUPLINGS, totals=True)
+    assert decay.shape == scatter.shape == (len(COUPLINGS), len(flux.axion_energy))
+    for i, g in enumerate(COUPLINGS):
+        single = copy.deepcopy(flux)
+        single.propagate(new_coupling=g)
+        np.testing.assert_allclose(decay[i], single.decay_axion_weight, rtol=1e-10, atol=0)
+        np.testing.assert_allclose(scatter[i], single.scatter_axion_weight, rtol=1e-10, atol=0)
+        np.testing.assert_allclose(decay_totals[i], np.sum(single.decay_axion_weight), rtol=1e-10)
+        np.testing.assert_allclose(scatter_totals[i], np.sum(single.scatter_axion_weight), rtol=1e-10)
+    assert np.any(decay > 0)
+
+
+def test_primakoff_couplings():
+    flux = fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_mass=0.5, axion_coupling=1e-5)
+    flux.simulate()
+    check_couplings(flux)
+    # several masses in one event table
+    flux.simulate_masses([0.05, 0.5, 5.0])
+    check_couplings(flux)
+
+
+def test_compton_couplings():
+    flux = fluxes.FluxComptonIsotropic(photon_flux=PHOTONS, axion_mass=2.0, axion_coupling=1e-6, seed=2)
+    flux.simulate()
+    check_couplings(flux)
@@ -0,0 +1,68 @@
+# simulate_shard + merge_event_tables against a full run with the same shard_rng streams
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+events = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".events")
+fmath = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fmath")
+
+PHOTONS = np.column_stack([np.logspace(-1, 2, 41), np.logspace(10, 8, 41)])
+SEED = 2024
+N_SHARDS = 4
+
+
+def full_run_with_shard_streams(flux):
+    # one process running the blocks of all shards in turn, each with its shard's stream
+    flux.events.clear()
+    for i, rows in enumerate(np.array_split(PHOTONS, N_SHARDS)):
+        flux.rng = fmath.shard_rng(SEED, i, N_SHARDS)
+        flux.simulate_block(rows)
+    return flux.events
+
+
+def test_merged_shards_match_full_run(tmp_path):
+    make = lambda: fluxes.FluxComptonIsotropic(photon_flux=PHOTONS, axion_mass=0.5, nsamples=25)
+    full = full_run_with_shard_streams(make())
+    paths = []
+    for i in range(N_SHARDS):
+        paths.append(str(tmp_path / "shard{}.npz".format(i)))
+        make().simulate_shard(i, N_SHARDS, seed=SEED).save(paths[i])
+    merged = events.merge_event_tables(paths)
+
+    assert len(merged) == len(full) > 0
+    for col in events.FluxEventTable.COLUMNS:
+        np.testing.assert_array_equal(getattr(merged, col), getattr(full, col))
+
+
+def test_shards_reproducible_and_independent():
+    make = lambda: fluxes.FluxBremIsotropic(electron_flux=PHOTONS, axion_mass=0.5, nsamples=25)
+    shards = [make().simulate_shard(i, N_SHARDS, seed=SEED) for i in range(N_SHARDS)]
+    again = make().simulate_shard(2, N_SHARDS, seed=SEED)
+    np.testing.assert_array_equal(again.energy, shards[2].energy)
+    other_seed = make().simulate_shard(2, N_SHARDS, seed=SEED + 1)
+    assert not np.array_equal(other_seed.energy, shards[2].energy)
+
+
+def test_deterministic_and_sample_split_fluxes():
+    # a deterministic flux merges to exactly the unsharded run
+    primakoff = fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_mass=0.5)
+    primakoff.simulate()
+    merged = events.merge_event_tables([fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_mass=0.5)
+                                        .simulate_shard(i, N_SHARDS, seed=SEED) for i in range(N_SHARDS)])
+    np.testing.assert_array_equal(merged.energy, primakoff.events.energy)
+    np.testing.assert_allclose(merged.flux, primakoff.events.flux, rtol=1e-12)
+
+    # the resonance flux splits its MC points between shards, normalized to the full nsamples
+    positrons = np.column_stack([np.linspace(1.0, 50.0, 200), np.full(200, 1e9)])
+    make = lambda: fluxes.FluxResonanceIsotropic(positron_flux=positrons, axion_mass=5.0, nsamples=40000, seed=1)
+    full = make()
+    full.simulate()
+    shards = [make().simulate_shard(i, N_SHARDS, seed=SEED) for i in range(N_SHARDS)]
+    merged = events.merge_event_tables(shards)
+    assert len(merged) == N_SHARDS and np.sum(full.events.flux) > 0
+    np.testing.assert_allclose(np.sum(merged.flux), np.sum(full.events.flux), rtol=2e-2)
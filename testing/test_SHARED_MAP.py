@@ -0,0 +1,63 @@
+# parallel.shared_map with several workers against a serial loop over the same rows and random streams
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+parallel = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".parallel")
+
+ROWS = np.column_stack([np.arange(23, dtype=float), np.linspace(0.5, 3.0, 23)])
+MAX_ROWS = 4
+
+
+class RowModel:
+    # up to MAX_ROWS outputs per input row, some rows none, with a random column from self.rng
+    def __init__(self):
+        self.rng = np.random.default_rng()
+        self.rows = ROWS
+
+    def per_row(self, row):
+        n = int(row[0]) % (MAX_ROWS + 1)
+        draws = self.rng.uniform(0.0, 1.0, n)
+        return np.full(n, row[0]), row[1] * np.arange(n), draws
+
+    def per_block(self, rows):
+        n = rows[:, 0].astype(int) % (MAX_ROWS + 1)
+        index = np.repeat(np.arange(len(rows)), n)
+        rank = np.arange(len(index)) - np.repeat(np.cumsum(n) - n, n)
+        return index, rows[index, 0], rows[index, 1] * rank, self.rng.uniform(0.0, 1.0, len(index))
+
+
+def serial_map(method_name, chunksize, seed, block=False):
+    # the ranges of shared_map evaluated in this process, with the same per-range streams
+    model = RowModel()
+    out = []
+    for start, stop, seed_seq in parallel._ranges(len(ROWS), 1, chunksize, seed):
+        model.rng = np.random.default_rng(seed_seq)
+        if block:
+            index, *columns = model.per_block(ROWS[start:stop])
+            out.append(np.column_stack(columns))
+        else:
+            out.extend(np.column_stack(getattr(model, method_name)(row)) for row in ROWS[start:stop])
+    return np.concatenate([o for o in out if len(o) > 0])
+
+
+def test_shared_map_rows_match_serial():
+    expected = serial_map('per_row', 4, 7)
+    for nworkers in (1, 3):
+        res = parallel.shared_map(RowModel(), 'per_row', ROWS, ncols=3, max_rows=MAX_ROWS, nworkers=nworkers,
+                                  chunksize=4, exclude=('rows',), seed=7)
+        np.testing.assert_array_equal(res, expected)
+
+
+def test_shared_map_blocks_match_serial():
+    expected = serial_map('per_block', 5, 3, block=True)
+    for nworkers in (1, 3):
+        res = parallel.shared_map(RowModel(), 'per_block', ROWS, ncols=3, max_rows=MAX_ROWS, nworkers=nworkers,
+                                  chunksize=5, exclude=('rows',), seed=3, block=True)
+        np.testing.assert_array_equal(res, expected)
+    # the rows of every input stay in input order whatever the chunking
+    np.testing.assert_array_equal(res[:, 0], np.repeat(ROWS[:, 0], ROWS[:, 0].astype(int) % (MAX_ROWS + 1)))
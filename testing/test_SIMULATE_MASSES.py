@@ -0,0 +1,46 @@
+# simulate_masses against one simulate (and propagate) per ALP mass
+import os
+import sys
+import importlib
+
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+fluxes = importlib.import_module(os.path.basename(PACKAGE_DIR) + ".fluxes")
+
+# includes masses above part or all of the photon spectrum
+MASSES = np.array([0.001, 0.1, 1.0, 3.0, 30.0, 200.0])
+PHOTONS = np.column_stack([np.logspace(-1, 2, 60), np.logspace(12, 8, 60)])
+
+
+def check_masses(batch, make_single):
+    events = batch.events
+    batch.propagate()
+    for ma in MASSES:
+        single = make_single(ma)
+        single.simulate()
+        single.propagate()
+        at_mass = np.asarray(events.mass) == ma
+        np.testing.assert_allclose(np.asarray(events.energy)[at_mass], single.events.energy, rtol=1e-12)
+        np.testing.assert_allclose(np.asarray(events.flux)[at_mass], single.events.flux, rtol=1e-12, atol=0)
+        np.testing.assert_allclose(np.asarray(batch.decay_axion_weight)[at_mass], single.decay_axion_weight,
+                                   rtol=1e-10, atol=0)
+        np.testing.assert_allclose(np.asarray(batch.scatter_axion_weight)[at_mass], single.scatter_axion_weight,
+                                   rtol=1e-10, atol=0)
+    assert len(events.energy) > 0
+
+
+def test_primakoff_masses():
+    batch = fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_coupling=1e-5)
+    batch.simulate_masses(MASSES)
+    check_masses(batch, lambda ma: fluxes.FluxPrimakoffIsotropic(photon_flux=PHOTONS, axion_mass=ma,
+                                                                 axion_coupling=1e-5))
+
+
+def test_nuclear_masses():
+    kwargs = dict(transition_energy=14.4, decay_rate=1e12, transition_type="M1", gann0=1e-6, gann1=1e-6,
+                  gagamma=1e-6)
+    batch = fluxes.FluxNuclearIsotropic(**kwargs)
+    batch.simulate_masses(MASSES)
+    check_masses(batch, lambda ma: fluxes.FluxNuclearIsotropic(axion_mass=ma, **kwargs))